@@ -0,0 +1,106 @@
+# Нагрузочный тест: синхронный TeleBot (пул потоков) против AsyncTeleBot
+# на фейковом Bot API с сетевой задержкой.
+# Запуск: python benchmarks/bench_async.py --users 200 --latency 0.05
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+from common import ROOT, Timer, quiet, report
+from mock_api import MockBotAPI
+from updates import callback_update, message_update, to_updates
+
+# Раунды: апдейт на каждого пользователя и сколько вызовов API он порождает
+ROUNDS = [
+    (lambda uid: message_update(uid, "/start"), 1),
+    (lambda uid: callback_update(uid, "my_profile"), 1),
+    (lambda uid: callback_update(uid, "my_history"), 1),
+    (lambda uid: callback_update(uid, "pay_aiyl"), 1),
+    (lambda uid: message_update(uid, "150"), 3),
+]
+
+SETTLE = 0.05
+
+
+def wait_calls(api, expected, timeout=120):
+    deadline = time.monotonic() + timeout
+    while sum(api.calls.values()) < expected:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"ожидали {expected} вызовов API, получили {sum(api.calls.values())}")
+        time.sleep(0.001)
+    # Счётчик растёт, когда запрос дошёл до API, а обработчик ещё может
+    # регистрировать следующий шаг — даём ему завершиться перед новым раундом
+    time.sleep(SETTLE)
+
+
+def run_sync(api, users, threads):
+    main = importlib.import_module("main")
+    bot = main.create_app()
+    bot.num_threads = threads
+    bot.worker_pool = type(bot.worker_pool)(bot, num_threads=threads)
+    api.reset()
+    expected = 0
+    with Timer() as t:
+        for make, calls in ROUNDS:
+            # По одному апдейту за вызов, как при вебхуке: в пачке TeleBot
+            # пропускает сообщения соседей после сработавшего next-step обработчика
+            for update in to_updates(make(uid) for uid in range(1, users + 1)):
+                bot.process_new_updates([update])
+            expected += calls * users
+            wait_calls(api, expected)
+    bot.worker_pool.close()
+    main.close_app()
+    return t.elapsed
+
+
+def run_async(api, users):
+    bot_async = importlib.import_module("bot_async")
+    bot = bot_async.create_app()
+
+    async def scenario():
+        api.reset()
+        expected = 0
+        with Timer() as t:
+            for make, calls in ROUNDS:
+                await asyncio.gather(*(
+                    bot.process_new_updates([update])
+                    for update in to_updates(make(uid) for uid in range(1, users + 1))
+                ))
+                expected += calls * users
+                await asyncio.to_thread(wait_calls, api, expected)
+        await bot_async.close_app()
+        return t.elapsed
+
+    return asyncio.run(scenario())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    # Без SendScheduler: иначе синхронный бот упирается в лимит отправки, а асинхронный — нет
+    os.environ.update(BOT_TOKEN="123:mock", SEND_SCHEDULER="0")
+    updates = args.users * len(ROUNDS)
+
+    with MockBotAPI(latency=args.latency) as api, tempfile.TemporaryDirectory() as tmp:
+        api.install()
+        # Боты открывают users.db и requisites/ относительно текущего каталога
+        os.symlink(os.path.join(ROOT, "requisites"), os.path.join(tmp, "requisites"))
+        os.chdir(tmp)
+        with quiet():
+            sync_seconds = run_sync(api, args.users, args.threads)
+        report(f"TeleBot, {args.threads} threads", updates, sync_seconds)
+        os.remove("users.db")
+        with quiet():
+            async_seconds = run_async(api, args.users)
+        report("AsyncTeleBot", updates, async_seconds)
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Рассылка по синтетической базе пользователей на фейковом Bot API:
+# память на чтение всех user_id сразу против постраничного чтения, пропускная
+# способность рассылки, 403/429 и продолжение после остановки на середине.
+# Запуск: python benchmarks/bench_broadcast.py --users 1000000 --stop-at 0.5
+# (1M пользователей через HTTP-клиент telebot — порядка десятков минут)
+import argparse
+import logging
+import threading
+import time
+import tracemalloc
+
+from common import Timer, report, temp_db_path
+from mock_api import MockBotAPI
+
+import telebot
+
+from broadcast import Broadcaster
+from database import Database
+from i18n import LocaleRegistry
+from sender import SendScheduler
+
+
+def seed(db, users):
+    with db._get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, lang, name, address) VALUES (?, ?, '', '')",
+            ((user_id, "kg" if user_id % 3 == 0 else "ru") for user_id in range(1, users + 1))
+        )
+        conn.commit()
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    with Timer() as t:
+        count = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, peak, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=1e6, help="общий лимит; по умолчанию не ограничивает мок")
+    parser.add_argument("--flood-every", type=int, default=5000)
+    parser.add_argument("--blocked-every", type=int, default=50)
+    parser.add_argument("--stop-at", type=float, default=0.5, help="доля рассылки, после которой имитируем остановку")
+    args = parser.parse_args()
+    logging.getLogger("sender").setLevel(logging.ERROR)
+
+    with temp_db_path() as path:
+        db = Database(path)
+        seed(db, args.users)
+
+        def fetch_all():
+            with db._get_connection() as conn:
+                return len(conn.execute("SELECT user_id, lang FROM users").fetchall())
+
+        def paged():
+            return sum(1 for _ in db.iter_user_langs())
+
+        for title, func in (("read all users at once", fetch_all), ("read users page by page", paged)):
+            count, peak, elapsed = peak_memory(func)
+            report(title, count, elapsed)
+            print(f"  peak memory: {peak / 1024 / 1024:.1f} MiB")
+
+        with MockBotAPI(flood_every=args.flood_every, retry_after=1, blocked_every=args.blocked_every) as api:
+            api.install()
+            bot = telebot.TeleBot("123:mock", threaded=False)
+            locales = LocaleRegistry()
+            sender = SendScheduler(bot, global_rate=args.rate, workers=args.workers)
+            broadcaster = Broadcaster(db, sender, locales)
+            broadcast_id = broadcaster.create(key="instruction_text")
+
+            # Останавливаем рассылку на середине, как при падении процесса
+            def stop_when_half_done():
+                while api.calls["sendMessage"] < args.users * args.stop_at:
+                    time.sleep(0.05)
+                broadcaster.stop()
+
+            if args.stop_at < 1:
+                threading.Thread(target=stop_when_half_done, daemon=True).start()
+            with Timer() as first:
+                state = broadcaster.run(broadcast_id)
+            report(f"broadcast until stop ({state['status']})", state["last_user_id"], first.elapsed)
+
+            with Timer() as second:
+                state = Broadcaster(db, sender, locales).run(broadcast_id)
+            sender.close()
+            report(f"whole broadcast with resume ({state['status']})", args.users, first.elapsed + second.elapsed)
+
+            calls = api.calls["sendMessage"]
+            flooded = calls // args.flood_every if args.flood_every else 0
+            print(f"  sent: {state['sent']}, blocked (403): {state['blocked']}, failed: {state['failed']}")
+            print(f"  API calls: {calls}, answered 429 and retried: ~{flooded}, "
+                  f"sent twice after resume: ~{calls - flooded - args.users}")
+        db.close()
+    assert state["sent"] + state["blocked"] + state["failed"] == args.users, state
+
+
+if __name__ == "__main__":
+    main()
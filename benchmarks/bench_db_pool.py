@@ -0,0 +1,77 @@
+# Сравнение старого режима (новое соединение на каждый вызов) с пулом соединений.
+# Запуск: python benchmarks/bench_db_pool.py --threads 16 --ops 2000
+import argparse
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from common import Timer, quiet, report, temp_db_path
+
+from database import Database
+
+
+class LegacyDatabase(Database):
+    # Поведение до пула: connect/commit/close на каждый запрос, журнал DELETE
+    def __init__(self, db_name):
+        super().__init__(db_name, pool_size=1, pragmas={"journal_mode": "DELETE", "synchronous": "FULL"})
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_name)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def workload(db, user_ids, ops, write_ratio):
+    rnd = random.Random()
+    for _ in range(ops):
+        user_id = rnd.choice(user_ids)
+        if rnd.random() < write_ratio:
+            db.update_name(user_id, f"name-{rnd.randint(0, 999)}")
+        else:
+            db.get_user(user_id)
+
+
+def run(db, threads, ops, write_ratio):
+    user_ids = list(range(1, 1001))
+    for user_id in user_ids:
+        db.add_user(user_id)
+    workers = [
+        threading.Thread(target=workload, args=(db, user_ids, ops, write_ratio))
+        for _ in range(threads)
+    ]
+    with Timer() as t:
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return threads * ops, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    results = {}
+    for label, factory in (
+        ("legacy (connect per call)", LegacyDatabase),
+        ("pooled WAL", lambda path: Database(path, pool_size=args.pool_size)),
+    ):
+        with temp_db_path() as path, quiet():
+            db = factory(path)
+            ops, seconds = run(db, args.threads, args.ops, args.write_ratio)
+            db.close()
+        results[label] = report(label, ops, seconds)
+    legacy, pooled = results.values()
+    print(f"speedup: x{pooled / legacy:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Отправка реквизитов через фейковый Bot API: загрузка файла каждый раз против file_id.
+# Запуск: python benchmarks/bench_file_id_cache.py --sends 200
+import argparse
+import glob
+import os
+import shutil
+
+from common import ROOT, Timer, quiet, report, temp_db_path
+from mock_api import MockBotAPI
+
+import telebot
+
+from database import Database
+from media import PhotoCache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sends", type=int, default=200)
+    args = parser.parse_args()
+    images = sorted(glob.glob(os.path.join(ROOT, "requisites", "*.jpg")))
+
+    with MockBotAPI() as api, temp_db_path() as path, quiet():
+        api.install()
+        bot = telebot.TeleBot("123:mock", threaded=False)
+        db = Database(path)
+
+        with Timer() as direct:
+            for i in range(args.sends):
+                with open(images[i % len(images)], "rb") as photo:
+                    bot.send_photo(42, photo=photo)
+        direct_bytes = api.uploaded_bytes
+        api.reset()
+
+        photos = PhotoCache(bot, db)
+        with Timer() as cached:
+            for i in range(args.sends):
+                photos.send_photo(42, images[i % len(images)])
+        cached_bytes, cached_uploads = api.uploaded_bytes, api.calls["sendPhoto"]
+
+        # "Перезапуск": новый кэш берёт file_id из базы и ничего не загружает
+        api.reset()
+        PhotoCache(bot, db).send_photo(42, images[0])
+        restart_bytes = api.uploaded_bytes
+
+        # Изменённая картинка загружается заново
+        changed = os.path.join(os.path.dirname(path), "changed.jpg")
+        shutil.copy(images[0], changed)
+        photos.send_photo(42, changed)
+        with open(changed, "ab") as f:
+            f.write(b"\0")
+        api.reset()
+        photos.send_photo(42, changed)
+        changed_bytes = api.uploaded_bytes
+        db.close()
+
+    report("upload every time", args.sends, direct.elapsed)
+    print(f"  uploaded: {direct_bytes} bytes")
+    report("file_id cache", args.sends, cached.elapsed)
+    print(f"  uploaded: {cached_bytes} bytes in {cached_uploads} sendPhoto calls")
+    print(f"  after restart: {restart_bytes} bytes, after image change: {changed_bytes} bytes")
+
+
+if __name__ == "__main__":
+    main()
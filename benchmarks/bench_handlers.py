@@ -0,0 +1,189 @@
+# Нагрузочный прогон обработчиков main.py на фейковом Bot API: /start, все ветки
+# callback_handler и диалоги ввода (сумма оплаты, имя, адрес). Апдейты
+# обрабатываются синхронно, для каждого шага считаются p50/p95/p99, апдейты в
+# секунду и число запросов SQLite на апдейт.
+# Запуск:
+#   python benchmarks/bench_handlers.py --users 200 --rounds 3
+#   python benchmarks/bench_handlers.py --updates recorded.jsonl   # записанные WEBHOOK_RECORD_PATH
+#   python benchmarks/bench_handlers.py --budget benchmarks/budgets.json   # код 1 при превышении бюджета
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from common import ROOT, Timer, count_sqlite, quiet
+from mock_api import MockBotAPI
+from updates import callback_update, message_update
+
+# Сценарии: (метка шага, callback или текст сообщения). Шаги внутри сценария
+# идут подряд от одного пользователя, поэтому диалоги ввода проходят целиком
+SCENARIOS = {
+    "start": [("start", "/start")],
+    "register": [("register", "cb:register")],
+    "main_menu": [("back_to_main", "cb:back_to_main"), ("instruction", "cb:instruction"), ("show_address", "cb:show_address")],
+    "profile": [("my_profile", "cb:my_profile"), ("edit_profile", "cb:edit_profile")],
+    "pay": [("pay", "cb:pay"), ("pay_bank", "cb:pay_aiyl"), ("payment_amount", "150.50")],
+    # {older} — курсор второй страницы этого пользователя (см. seed_history)
+    "history": [("my_history", "cb:my_history"), ("history_page", "cb:history_before_{older}")],
+    "lang": [("change_lang", "cb:change_lang"), ("lang", "cb:lang_kg"), ("lang", "cb:lang_ru")],
+    "name": [("set_name", "cb:set_name"), ("name_input", "Тест Тестов")],
+    "address": [("set_address", "cb:set_address"), ("address_input", "ул. Тестовая, 1")],
+}
+
+
+def make_update(user_id, step):
+    if step.startswith("cb:"):
+        return callback_update(user_id, step[3:])
+    return message_update(user_id, step)
+
+
+def seed_history(db, users):
+    # По две страницы старых транзакций на пользователя, чтобы листание истории
+    # читало настоящую вторую страницу. Возвращает {user_id: курсор «старее»}
+    # с первой страницы — id последней строки на ней
+    from views import HISTORY_PAGE_SIZE
+
+    per_user = 2 * HISTORY_PAGE_SIZE
+    start = int(time.time()) - 30 * 86400
+    rows = [
+        (user_id, "MBank", 100.0, datetime.fromtimestamp(start + i * 60).strftime("%Y-%m-%d %H:%M:%S"), start + i * 60)
+        for user_id in range(1, users + 1) for i in range(per_user)
+    ]
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO transactions (user_id, bank, amount, date, ts) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        return {
+            user_id: conn.execute(
+                "SELECT id FROM transactions WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT 1 OFFSET ?",
+                (user_id, HISTORY_PAGE_SIZE - 1)
+            ).fetchone()[0]
+            for user_id in range(1, users + 1)
+        }
+
+
+def synthetic(users, rounds, cursors):
+    for _ in range(rounds):
+        for steps in SCENARIOS.values():
+            for user_id in range(1, users + 1):
+                for label, step in steps:
+                    yield label, make_update(user_id, step.format(older=cursors[user_id]))
+
+
+def recorded(path):
+    from instrumentation import callback_branch
+
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                callback = update.get("callback_query")
+                yield (callback_branch(callback.get("data", "")) if callback else "message"), update
+
+
+def percentile(values, p):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def summarize(latencies, sqlite_ops):
+    rows = {}
+    for label, values in latencies.items():
+        rows[label] = {
+            "updates": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "sqlite_ops": sqlite_ops[label] / len(values),
+        }
+    return rows
+
+
+def check_budget(rows, total_rate, budget):
+    # budget: {"<метка>": {"p95_ms": ..., "p99_ms": ..., "sqlite_ops": ...}, "_total": {"min_updates_per_sec": ...}}
+    violations = []
+    for label, limits in budget.items():
+        if label == "_total":
+            minimum = limits.get("min_updates_per_sec")
+            if minimum is not None and total_rate < minimum:
+                violations.append(f"total: {total_rate:.0f} updates/s < {minimum}")
+            continue
+        row = rows.get(label)
+        if row is None:
+            continue
+        for key, limit in limits.items():
+            if row[key] > limit:
+                violations.append(f"{label}: {key} {row[key]:.2f} > {limit}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--updates", help="JSONL с записанными апдейтами вместо синтетических")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового Bot API")
+    parser.add_argument("--scheduler", action="store_true", help="отправка через SendScheduler (по умолчанию напрямую)")
+    parser.add_argument("--budget", help="JSON с бюджетами; при превышении — код выхода 1")
+    args = parser.parse_args()
+    # Пути — до chdir во временный каталог
+    budget_path = os.path.abspath(args.budget) if args.budget else None
+    updates_path = os.path.abspath(args.updates) if args.updates else None
+    os.environ.update(BOT_TOKEN="123:mock", SEND_SCHEDULER="1" if args.scheduler else "0", BROADCAST_WATCH="0")
+
+    with MockBotAPI(latency=args.latency) as api, tempfile.TemporaryDirectory() as tmp:
+        api.install()
+        os.symlink(os.path.join(ROOT, "requisites"), os.path.join(tmp, "requisites"))
+        os.chdir(tmp)
+        with quiet():
+            import main as bot_main
+            from telebot import types
+
+            bot = bot_main.create_app()
+            bot.threaded = False
+            if updates_path:
+                source = recorded(updates_path)
+            else:
+                source = synthetic(args.users, args.rounds, seed_history(bot_main.db, args.users))
+            stats = count_sqlite(bot_main.db)
+            latencies = defaultdict(list)
+            sqlite_ops = defaultdict(int)
+            with Timer() as total:
+                for label, raw in source:
+                    update = types.Update.de_json(raw)
+                    before = stats["queries"]
+                    with Timer() as t:
+                        bot.process_new_updates([update])
+                        # Фоновая запись транзакций — в шаг, который её создал (payment_amount),
+                        # а не в следующий, куда она попала бы через max_latency
+                        bot_main.db.transactions.flush()
+                    latencies[label].append(t.elapsed)
+                    sqlite_ops[label] += stats["queries"] - before
+            bot_main.close_app()
+        os.chdir(ROOT)
+
+    rows = summarize(latencies, sqlite_ops)
+    count = sum(row["updates"] for row in rows.values())
+    rate = count / total.elapsed
+    print(f"{'step':<16} {'updates':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sqlite/upd':>10}")
+    for label, row in rows.items():
+        print(f"{label:<16} {row['updates']:>8} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} {row['sqlite_ops']:10.2f}")
+    print(f"total: {count} updates in {total.elapsed:.2f} s ({rate:.0f} updates/s), API calls: {dict(api.calls)}")
+
+    if budget_path:
+        with open(budget_path, encoding="utf-8") as f:
+            violations = check_budget(rows, rate, json.load(f))
+        for violation in violations:
+            print(f"BUDGET EXCEEDED {violation}")
+        if violations:
+            sys.exit(1)
+        print("budget: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# История транзакций на большой синтетической таблице:
+# полный ORDER BY без индекса + fetchall против индекса и keyset-страниц.
+# Запуск: python benchmarks/bench_history.py --rows 3000000 --users 20000
+import argparse
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from common import Timer, quiet, report, temp_db_path
+
+from database import Database
+from views import HISTORY_PAGE_SIZE
+
+
+def fill(path, rows, users):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, bank TEXT, amount REAL, date TEXT
+        )
+    """)
+    rnd = random.Random(1)
+    start = datetime(2024, 1, 1)
+    conn.executemany(
+        "INSERT INTO transactions (user_id, bank, amount, date) VALUES (?, ?, ?, ?)",
+        (
+            (rnd.randint(1, users), "Aiyl Bank", rnd.randint(1, 10_000) / 1,
+             (start + timedelta(seconds=rnd.randint(0, 3600 * 24 * 600))).strftime("%Y-%m-%d %H:%M:%S"))
+            for _ in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    rnd = random.Random(2)
+    sample = [rnd.randint(1, args.users) for _ in range(args.queries)]
+
+    with temp_db_path() as path:
+        with Timer() as t:
+            fill(path, args.rows, args.users)
+        print(f"filled {args.rows} rows in {t.elapsed:.1f} s")
+
+        conn = sqlite3.connect(path)
+        with Timer() as t:
+            for user_id in sample:
+                conn.execute(
+                    "SELECT bank, amount, date FROM transactions WHERE user_id = ? ORDER BY date DESC", (user_id,)
+                ).fetchall()
+        conn.close()
+        report("no index, full history", args.queries, t.elapsed)
+
+        with quiet(), Timer() as t:
+            db = Database(path)  # применяет миграцию с индексом
+        print(f"migration (index build): {t.elapsed:.1f} s")
+
+        with quiet(), Timer() as t:
+            for user_id in sample:
+                db.get_transactions(user_id)
+        report("index, full history", args.queries, t.elapsed)
+
+        with quiet(), Timer() as t:
+            for user_id in sample:
+                db.get_transactions(user_id, limit=HISTORY_PAGE_SIZE + 1)
+        report("index, first page", args.queries, t.elapsed)
+
+        with quiet(), Timer() as t:
+            pages = 0
+            for user_id in sample[:50]:
+                before = None
+                while True:
+                    rows = db.get_transactions(user_id, before=before, limit=HISTORY_PAGE_SIZE + 1)
+                    pages += 1
+                    if len(rows) <= HISTORY_PAGE_SIZE:
+                        break
+                    before = rows[HISTORY_PAGE_SIZE - 1][3]
+        report("index, keyset page walk", pages, t.elapsed)
+        with quiet():
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Построение и сериализация клавиатур на каждый ответ против KeyboardCache.
+# Запуск: python benchmarks/bench_keyboards.py --ops 20000
+import argparse
+
+from common import Timer, quiet, report
+
+from i18n import LocaleRegistry
+from keyboards import BUILDERS, KeyboardCache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+    registry = LocaleRegistry()
+    names = list(BUILDERS)
+    langs = list(registry.languages())
+
+    with quiet(), Timer() as t:
+        for i in range(args.ops):
+            locale = registry.get(langs[i % len(langs)])
+            BUILDERS[names[i % len(names)]](locale).to_json()
+    before = report("build + to_json per send", args.ops, t.elapsed)
+
+    cache = KeyboardCache(registry)
+    with quiet(), Timer() as t:
+        for i in range(args.ops):
+            cache.get(names[i % len(names)], langs[i % len(langs)])
+    after = report("KeyboardCache.get", args.ops, t.elapsed)
+    print(f"speedup: x{after / before:.0f}")
+
+
+if __name__ == "__main__":
+    main()
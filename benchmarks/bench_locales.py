@@ -0,0 +1,42 @@
+# Стоимость получения локали: чтение JSON с диска на каждый запрос против реестра.
+# Запуск: python benchmarks/bench_locales.py --ops 20000
+import argparse
+import json
+import os
+
+from common import Timer, report
+
+from i18n import LOCALES_DIR, LocaleRegistry
+
+
+def load_locale_from_disk(lang):
+    # Старая реализация из main.py
+    try:
+        with open(os.path.join(LOCALES_DIR, f"{lang}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return load_locale_from_disk("ru")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+    langs = ["ru", "kg", "en"]  # en нет на диске — проверяем промах с откатом на ru
+
+    with Timer() as t:
+        for i in range(args.ops):
+            load_locale_from_disk(langs[i % 3])["welcome"]
+    before = report("json.load per request", args.ops, t.elapsed)
+
+    for label, hot_reload in (("registry", False), ("registry + hot reload", True)):
+        registry = LocaleRegistry(hot_reload=hot_reload)
+        with Timer() as t:
+            for i in range(args.ops):
+                registry.get(langs[i % 3])["welcome"]
+        after = report(label, args.ops, t.elapsed)
+        print(f"  speedup: x{after / before:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Нагрузка на кэш профилей: много пользователей, skewed-распределение обращений.
+# Помогает подобрать cache_size/cache_ttl. Запуск:
+#   python benchmarks/bench_profile_cache.py --users 300000 --cache-size 100000
+import argparse
+import random
+import threading
+
+from common import Timer, quiet, report, temp_db_path
+
+from database import Database
+
+
+def fill(db, users):
+    with db._get_connection() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id, lang, name, address) VALUES (?, 'ru', '', '')",
+            ((user_id,) for user_id in range(1, users + 1)),
+        )
+        conn.commit()
+
+
+def workload(db, users, ops, seed):
+    rnd = random.Random(seed)
+    for _ in range(ops):
+        # Парето: небольшая доля активных пользователей даёт большинство запросов
+        user_id = min(users, int(rnd.paretovariate(1.2)))
+        db.get_user(user_id)
+        if rnd.random() < 0.05:
+            db.update_address(user_id, f"addr-{rnd.randint(0, 999)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=300_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--cache-size", type=int, default=100_000)
+    parser.add_argument("--cache-ttl", type=float, default=600.0)
+    args = parser.parse_args()
+
+    for label, size in (("no cache", 0), (f"cache size={args.cache_size}", args.cache_size)):
+        with temp_db_path() as path, quiet():
+            db = Database(path, cache_size=size, cache_ttl=args.cache_ttl)
+            fill(db, args.users)
+            workers = [
+                threading.Thread(target=workload, args=(db, args.users, args.ops, seed))
+                for seed in range(args.threads)
+            ]
+            with Timer() as t:
+                for w in workers:
+                    w.start()
+                for w in workers:
+                    w.join()
+            stats = db.cache.stats()
+            db.close()
+        report(label, args.threads * args.ops, t.elapsed)
+        print(f"  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Отчёты по транзакциям на синтетической таблице: миграция с заполнением ts и
+# агрегатов, суммы по банкам за день и по пользователям (GROUP BY по всей таблице
+# против готовых агрегатов), выборка недели по TEXT date против индекса на ts,
+# потоковая выгрузка и цена поддержки агрегатов при записи.
+# Запуск: python benchmarks/bench_reports.py --rows 20000000 --users 200000
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from common import Timer, quiet, report, temp_db_path
+
+from database import MIGRATIONS, Database
+from reports import day_to_ts, export
+
+BANKS = ["Aiyl Bank", "RSK Bank", "Bakai Bank", "MBank", "O!Bank", "Optima Bank", "Сбербанк", "Тинькофф", "ВТБ"]
+DAYS = 365
+
+
+def seed_legacy(path, rows, users, chunk=100_000):
+    # База в формате до миграции 3: только TEXT date, без ts и агрегатов
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            bank TEXT,
+            amount REAL,
+            date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_transactions_user_date ON transactions (user_id, date)")
+    conn.execute("PRAGMA user_version = 2")
+    rnd = random.Random(1)
+    start = time.time() - DAYS * 86400
+    for offset in range(0, rows, chunk):
+        conn.executemany(
+            "INSERT INTO transactions (user_id, bank, amount, date) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    rnd.randint(1, users), rnd.choice(BANKS), round(rnd.uniform(10, 5000), 2),
+                    datetime.fromtimestamp(start + (offset + i) * DAYS * 86400 / rows).strftime("%Y-%m-%d %H:%M:%S"),
+                )
+                for i in range(min(chunk, rows - offset))
+            ),
+        )
+        conn.commit()
+    conn.close()
+
+
+def timed_query(db, sql, params=()):
+    with Timer() as t, db._get_connection() as conn:
+        result = conn.execute(sql, params).fetchall()
+    return result, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--writes", type=int, default=100_000, help="add_transaction для оценки цены агрегатов")
+    args = parser.parse_args()
+
+    with temp_db_path() as path:
+        with Timer() as t:
+            seed_legacy(path, args.rows, args.users)
+        report("seed legacy rows", args.rows, t.elapsed)
+
+        with Timer() as t, quiet():
+            db = Database(path)
+        report(f"migration to v{len(MIGRATIONS)} (ts + aggregates)", args.rows, t.elapsed)
+
+        rows, scan = timed_query(db, "SELECT substr(date, 1, 10), bank, COUNT(*), SUM(amount) FROM transactions GROUP BY 1, 2")
+        report("daily totals: GROUP BY over transactions", len(rows), scan)
+        rows, agg = timed_query(db, "SELECT day, bank, count, amount FROM daily_bank_totals")
+        report("daily totals: daily_bank_totals", len(rows), agg)
+        print(f"  speedup: x{scan / agg:.0f}")
+
+        rows, scan = timed_query(db, "SELECT user_id, COUNT(*), SUM(amount) FROM transactions GROUP BY user_id")
+        report("user totals: GROUP BY over transactions", len(rows), scan)
+        rows, agg = timed_query(db, "SELECT user_id, count, amount FROM user_totals")
+        report("user totals: user_totals", len(rows), agg)
+        print(f"  speedup: x{scan / agg:.0f}")
+
+        since = datetime.fromtimestamp(time.time() - 30 * 86400).strftime("%Y-%m-%d")
+        until = datetime.fromtimestamp(time.time() - 23 * 86400).strftime("%Y-%m-%d")
+        last_day = datetime.fromtimestamp(time.time() - 24 * 86400).strftime("%Y-%m-%d")
+        rows, scan = timed_query(
+            db, "SELECT id, user_id, bank, amount FROM transactions WHERE date >= ? AND date < ?", (since, until)
+        )
+        report("one week by TEXT date (full scan)", len(rows), scan)
+        rows, indexed = timed_query(
+            db, "SELECT id, user_id, bank, amount FROM transactions WHERE ts >= ? AND ts < ?",
+            (day_to_ts(since), day_to_ts(until))
+        )
+        report("one week by ts (index)", len(rows), indexed)
+        print(f"  speedup: x{scan / indexed:.0f}")
+
+        with Timer() as t, quiet():
+            exported = export(db, "transactions", os.devnull, since=since, until=last_day)
+        report("stream one week to CSV", exported, t.elapsed)
+
+        with Timer() as t:
+            for i in range(args.writes):
+                db.add_transaction(i % args.users + 1, BANKS[i % len(BANKS)], 100.0)
+            db.transactions.flush()
+        report("add_transaction with aggregates", args.writes, t.elapsed)
+        with quiet():
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Планировщик исходящих сообщений против прямой отправки на фейковом Bot API,
+# который отвечает 429 на каждый N-й запрос.
+# Запуск: python benchmarks/bench_sender.py --chats 10 --burst 5 --broadcast 200 --flood-every 40
+import argparse
+import logging
+import time
+from collections import defaultdict
+
+from common import Timer, report
+from mock_api import MockBotAPI
+
+import telebot
+from telebot.apihelper import ApiTelegramException
+
+from sender import BROADCAST, INTERACTIVE, SendScheduler
+
+
+def max_in_window(times, window=1.0):
+    # Наибольшее число запросов за любое окно длиной window секунд
+    best, start = 0, 0
+    for end, t in enumerate(times):
+        while t - times[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=5, help="сообщений подряд в каждый чат")
+    parser.add_argument("--broadcast", type=int, default=200)
+    parser.add_argument("--flood-every", type=int, default=40)
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    args = parser.parse_args()
+    logging.getLogger("sender").setLevel(logging.ERROR)
+
+    with MockBotAPI(flood_every=args.flood_every) as api:
+        api.install()
+        bot = telebot.TeleBot("123:mock", threaded=False)
+
+        # Прямая отправка: 429 превращается в ошибку у вызывающего
+        failed = 0
+        with Timer() as direct:
+            for i in range(args.broadcast):
+                try:
+                    bot.send_message(100_000 + i, f"news {i}")
+                except ApiTelegramException:
+                    failed += 1
+        report("direct send", args.broadcast, direct.elapsed)
+        print(f"  failed with 429: {failed}")
+
+        api.reset()
+        api.record_requests = True
+        sender = SendScheduler(bot, global_rate=args.global_rate)
+        latencies = defaultdict(list)
+
+        def track(future, kind):
+            started = time.monotonic()
+            future.add_done_callback(lambda _: latencies[kind].append(time.monotonic() - started))
+
+        with Timer() as scheduled:
+            # Сначала рассылка, затем пачки ответов пользователям — они должны обогнать рассылку
+            futures = []
+            for i in range(args.broadcast):
+                future = sender.send_message(100_000 + i, f"news {i}", priority=BROADCAST)
+                track(future, "broadcast")
+                futures.append(future)
+            for chat in range(args.chats):
+                for n in range(args.burst):
+                    markup = '{"inline_keyboard":[]}' if n == args.burst - 1 else None
+                    future = sender.send_message(chat + 1, f"reply {n}", priority=INTERACTIVE, reply_markup=markup)
+                    track(future, "interactive")
+                    futures.append(future)
+            for future in futures:
+                future.result()
+        sender.close()
+
+        messages = [(t, int(params["chat_id"])) for t, method, params in api.requests if method == "sendMessage"]
+        per_chat = defaultdict(list)
+        for t, chat_id in messages:
+            per_chat[chat_id].append(t)
+
+    total = args.broadcast + args.chats * args.burst
+    report("scheduled send", total, scheduled.elapsed)
+    # Мок отвечает 429 на каждый flood_every-й запрос
+    flooded = len(messages) // args.flood_every if args.flood_every else 0
+    print(f"  API calls: {len(messages)}, answered 429 and retried: {flooded}, merged away: {total - (len(messages) - flooded)}")
+    print(f"  max requests in 1 s: {max_in_window([t for t, _ in messages])} (limit {args.global_rate:.0f})")
+    print(f"  max requests to one chat in 1 s: {max(max_in_window(times) for times in per_chat.values())}")
+    for kind in ("interactive", "broadcast"):
+        print(f"  {kind:<12} p50 {percentile(latencies[kind], 0.5) * 1000:8.1f} ms  p95 {percentile(latencies[kind], 0.95) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
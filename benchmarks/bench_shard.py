@@ -0,0 +1,59 @@
+# Многопроцессный режим против одного процесса на фейковом Bot API.
+# Диспетчер раскладывает апдейты /start по воркерам; на середине прогона
+# воркеры поочерёдно перезапускаются — ни один апдейт не должен потеряться.
+# Запуск: python benchmarks/bench_shard.py --users 500 --updates 20000 --workers 1 4
+import argparse
+import os
+import tempfile
+
+from common import ROOT, Timer, report
+from mock_api import MockBotAPI
+from updates import message_update
+
+from database import Database
+from shard import ShardRouter
+
+
+def run(api, workers, users, updates, restart):
+    api.reset()
+    router = ShardRouter(workers=workers, queue_size=4096).start()
+    with Timer() as t:
+        for i in range(updates):
+            router.submit(message_update(i % users + 1, "/start"), block=True)
+            if restart and i == updates // 2:
+                for index in range(workers):
+                    router.restart(index)
+        router.stop(timeout=600)
+    report(f"{workers} worker process(es)", updates, t.elapsed)
+    stats = router.stats()
+    replies = api.calls["sendMessage"]
+    print(f"  replies: {replies}/{updates}, restarts: {stats['restarts']}")
+    assert replies == updates, (replies, updates)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового Bot API")
+    parser.add_argument("--no-restart", action="store_true")
+    args = parser.parse_args()
+
+    with MockBotAPI(latency=args.latency) as api, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            BOT_TOKEN="123:mock",
+            BOT_API_URL=api.api_url,
+            # Без планировщика: каждый /start — ровно один sendMessage
+            SEND_SCHEDULER="0",
+        )
+        os.symlink(os.path.join(ROOT, "requisites"), os.path.join(tmp, "requisites"))
+        os.chdir(tmp)
+        Database().close()
+        for workers in args.workers:
+            run(api, workers, args.users, args.updates, not args.no_restart)
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
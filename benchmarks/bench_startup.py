@@ -0,0 +1,64 @@
+# Холодный старт: время импорта main и сборки бота create_app() в новом
+# интерпретаторе, а также самые дорогие модули по данным -X importtime.
+# Запуск: python benchmarks/bench_startup.py --runs 10 --top 10
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+IMPORT_ONLY = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+CREATE_APP = (
+    "import time; t = time.perf_counter(); import main; main.create_app(); "
+    "print(time.perf_counter() - t); main.close_app()"
+)
+
+
+def run(code, cwd, env, runs):
+    # Медиана по нескольким запускам свежего интерпретатора, в миллисекундах
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, check=True, capture_output=True, text=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return statistics.median(times)
+
+
+def import_profile(cwd, env, top):
+    # Строки -X importtime: "import time: self | cumulative | module"
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=cwd, env=env, check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    env = dict(os.environ, BOT_TOKEN="123:mock", PYTHONPATH=ROOT, SEND_SCHEDULER="0")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'import main':<40} {run(IMPORT_ONLY, tmp, env, args.runs):8.1f} ms")
+        assert not os.path.exists(os.path.join(tmp, "users.db")), "import main не должен создавать базу"
+        # Первый запуск создаёт схему, следующие только сверяют PRAGMA user_version
+        print(f"{'import + create_app (new db)':<40} {run(CREATE_APP, tmp, env, 1):8.1f} ms")
+        print(f"{'import + create_app (migrated db)':<40} {run(CREATE_APP, tmp, env, args.runs):8.1f} ms")
+        print("\nslowest imports of main (cumulative / self, ms):")
+        for cumulative, self_time, module in import_profile(tmp, env, args.top):
+            print(f"  {cumulative / 1000:8.1f} {self_time / 1000:8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Брошенные диалоги: память и размер хранилища остаются ограниченными благодаря TTL.
+# Для сравнения — next-step обработчики TeleBot, которые живут, пока пользователь не ответит.
+# Запуск: python benchmarks/bench_states.py --flows 200000 --ttl 0.5
+import argparse
+import time
+import tracemalloc
+
+from common import Timer, quiet, report, temp_db_path
+
+from telebot.handler_backends import MemoryHandlerBackend
+
+from database import Database
+from states import ConversationStates, MemoryStateStorage, SQLiteStateStorage
+
+
+def abandon(set_state, flows, ttl, checkpoints=5):
+    # Каждая «волна» начинает диалоги у новых пользователей и никогда их не завершает
+    per_wave = flows // checkpoints
+    samples = []
+    for wave in range(checkpoints):
+        for chat_id in range(wave * per_wave, (wave + 1) * per_wave):
+            set_state(chat_id)
+        samples.append(tracemalloc.get_traced_memory()[0])
+        time.sleep(ttl)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=200_000)
+    parser.add_argument("--ttl", type=float, default=0.5)
+    args = parser.parse_args()
+
+    def fmt(samples):
+        return " -> ".join(f"{s / 1024 / 1024:.1f}MB" for s in samples)
+
+    tracemalloc.start()
+    backend = MemoryHandlerBackend()
+    samples = abandon(lambda chat_id: backend.register_handler(chat_id, lambda m: None), args.flows, args.ttl)
+    print(f"TeleBot next-step handlers:  {fmt(samples)}  entries={len(backend.handlers)}")
+    del backend
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    storage = MemoryStateStorage(ttl=args.ttl)
+    conversation = ConversationStates(storage)
+    samples = abandon(lambda chat_id: conversation.set(chat_id, "payment_amount", data="pay_aiyl"), args.flows, args.ttl)
+    print(f"MemoryStateStorage (TTL):    {fmt(samples)}  entries={len(storage)}")
+    tracemalloc.stop()
+
+    with temp_db_path() as path, quiet():
+        db = Database(path)
+        storage = SQLiteStateStorage(db, ttl=args.ttl, purge_interval=args.ttl)
+        conversation = ConversationStates(storage)
+        flows = min(args.flows, 50_000)
+        with Timer() as t:
+            abandon(lambda chat_id: conversation.set(chat_id, "name"), flows, args.ttl)
+        with db._get_connection() as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM conversation_states").fetchone()[0]
+        lookups = flows
+        with Timer() as lookup:
+            for chat_id in range(lookups):
+                conversation.has_state(chat_id)
+        db.close()
+    print(f"SQLiteStateStorage (TTL):    rows left={rows} of {flows}")
+    report("  SQLite set_state", flows, t.elapsed - args.ttl * 5)
+    report("  SQLite has_state", lookups, lookup.elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Вставка транзакций: commit на каждую строку против фоновой пакетной записи.
+# Запуск: python benchmarks/bench_transactions.py --threads 8 --rows 2000
+import argparse
+import threading
+from datetime import datetime
+
+from common import Timer, quiet, report, temp_db_path
+
+from database import Database
+
+
+def per_row_commit(db, user_id, rows):
+    # Прежняя реализация add_transaction: отдельный INSERT и commit на строку
+    for i in range(rows):
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with db._get_connection() as conn:
+            conn.execute(
+                "INSERT INTO transactions (user_id, bank, amount, date) VALUES (?, ?, ?, ?)",
+                (user_id, "Aiyl Bank", float(i), date)
+            )
+            conn.commit()
+
+
+def write_behind(db, user_id, rows):
+    for i in range(rows):
+        db.add_transaction(user_id, "Aiyl Bank", float(i))
+
+
+def run(label, func, threads, rows, synchronous, **db_kwargs):
+    with temp_db_path() as path, quiet():
+        db = Database(path, pragmas={"synchronous": synchronous}, **db_kwargs)
+        workers = [threading.Thread(target=func, args=(db, uid, rows)) for uid in range(threads)]
+        with Timer() as t:
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            db.close()  # включает сброс очереди на диск
+        db = Database(path)
+        with db._get_connection() as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        db.close()
+    assert stored == threads * rows, (stored, threads * rows)
+    return report(f"{label} (synchronous={synchronous})", stored, t.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    for synchronous in ("FULL", "NORMAL"):
+        before = run("per-row commit", per_row_commit, args.threads, args.rows, synchronous)
+        after = run("write-behind batches", write_behind, args.threads, args.rows, synchronous,
+                    write_batch_size=args.batch_size, write_max_latency=args.max_latency)
+        print(f"  speedup: x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
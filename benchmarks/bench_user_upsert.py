@@ -0,0 +1,72 @@
+# Запросы, commit'ы и соединения на один вызов обработчика: прежняя цепочка
+# user_exists/add_user/update_*/get_user против get_or_create_user и update_*_returning.
+# Запуск: python benchmarks/bench_user_upsert.py --users 2000 --cache-size 0
+import argparse
+
+from common import Timer, count_sqlite, quiet, report, temp_db_path
+
+from database import Database
+
+
+def old_add_user(db, user_id):
+    # Прежняя реализация add_user: INSERT OR REPLACE стирал имя и адрес при гонке
+    with db._get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO users (user_id, lang, name, address) VALUES (?, 'ru', '', '')",
+            (user_id,)
+        )
+        conn.commit()
+    db.cache.set(user_id, {"lang": "ru", "name": "", "address": ""})
+
+
+def start_before(db, user_id):
+    if not db.user_exists(user_id):
+        old_add_user(db, user_id)
+    return db.get_user(user_id)
+
+
+def start_after(db, user_id):
+    return db.get_or_create_user(user_id)[0]
+
+
+def name_before(db, user_id):
+    if not db.user_exists(user_id):
+        old_add_user(db, user_id)
+    db.update_name(user_id, f"name-{user_id}")
+    return db.get_user(user_id)
+
+
+def name_after(db, user_id):
+    return db.update_name_returning(user_id, f"name-{user_id}")
+
+
+def run(label, handler, users, existing, cache_size):
+    with temp_db_path() as path, quiet():
+        db = Database(path, cache_size=cache_size)
+        if existing:
+            for user_id in range(1, users + 1):
+                db.get_or_create_user(user_id)
+        db.cache.clear()
+        stats = count_sqlite(db)
+        with Timer() as t:
+            for user_id in range(1, users + 1):
+                handler(db, user_id)
+        db.close()
+    report(label, users, t.elapsed)
+    print("  per call: " + ", ".join(f"{key} {stats[key] / users:.2f}" for key in ("queries", "commits", "connections")))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--cache-size", type=int, default=0, help="0 — без кэша профилей (холодный старт)")
+    args = parser.parse_args()
+    for handler_name, before, after in (("start", start_before, start_after), ("name input", name_before, name_after)):
+        for existing in (False, True):
+            who = "existing user" if existing else "new user"
+            run(f"{handler_name}, {who}, before", before, args.users, existing, args.cache_size)
+            run(f"{handler_name}, {who}, after", after, args.users, existing, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
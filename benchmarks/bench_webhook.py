@@ -0,0 +1,126 @@
+# Воспроизведение апдейтов через вебхук с заданной частотой.
+# Апдейты берутся из файла, записанного сервером (WEBHOOK_RECORD_PATH),
+# или генерируются. Запуск:
+#   python benchmarks/bench_webhook.py --rate 500 --seconds 5 --workers 8 --queue-size 256
+#   python benchmarks/bench_webhook.py --updates recorded.jsonl --rate 200
+import argparse
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from common import ROOT, quiet
+from mock_api import MockBotAPI
+from updates import callback_update, message_update
+
+
+def synthetic_updates(users):
+    scenario = ["/start", "my_profile", "pay", "my_history", "back_to_main"]
+    for step in itertools.cycle(scenario):
+        for uid in range(1, users + 1):
+            yield message_update(uid, step) if step.startswith("/") else callback_update(uid, step)
+
+
+def recorded_updates(path):
+    with open(path, "rb") as f:
+        lines = [line for line in f if line.strip()]
+    for line in itertools.cycle(lines):
+        yield json.loads(line)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+def replay(url, source, rate, seconds, clients):
+    statuses = {}
+    lock = threading.Lock()
+    source_lock = threading.Lock()
+    start = time.monotonic()
+    total = int(rate * seconds)
+    counter = itertools.count()
+
+    def client():
+        session = requests.Session()
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            # Равномерный темп: i-й апдейт уходит не раньше start + i / rate
+            delay = start + i / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with source_lock:
+                update = next(source)
+            status = session.post(url, json=update).status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", help="JSONL с записанными апдейтами")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=500, help="апдейтов в секунду")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--overflow", choices=["reject", "drop"], default="reject")
+    parser.add_argument("--latency", type=float, default=0.01, help="задержка фейкового Bot API")
+    args = parser.parse_args()
+    # Без SendScheduler: иначе обработчики только ставят сообщения в очередь и
+    # "queue+handler latency" не включает саму отправку
+    os.environ.update(BOT_TOKEN="123:mock", SEND_SCHEDULER="0")
+
+    with MockBotAPI(latency=args.latency) as api, tempfile.TemporaryDirectory() as tmp:
+        api.install()
+        os.symlink(os.path.join(ROOT, "requisites"), os.path.join(tmp, "requisites"))
+        os.chdir(tmp)
+        with quiet():
+            import main as bot_main
+            import webhook
+            dispatcher = webhook.UpdateDispatcher(
+                webhook.telebot_processor(bot_main.create_app()),
+                workers=args.workers, queue_size=args.queue_size, overflow=args.overflow,
+            ).start()
+            server = webhook.make_server(dispatcher, host="127.0.0.1", port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://127.0.0.1:%d/webhook" % server.server_address[1]
+
+            source = recorded_updates(args.updates) if args.updates else synthetic_updates(args.users)
+            statuses, elapsed = replay(url, source, args.rate, args.seconds, args.clients)
+            dispatcher.join()
+            server.shutdown()
+            dispatcher.stop()
+            bot_main.close_app()
+        os.chdir(ROOT)
+
+    stats = dispatcher.stats()
+    latencies = list(dispatcher.latencies)
+    sent = sum(statuses.values())
+    print(f"sent {sent} updates in {elapsed:.2f} s ({sent / elapsed:.0f}/s, target {args.rate:.0f}/s)")
+    print(f"HTTP statuses: {statuses}")
+    print(f"dispatcher: {stats}")
+    print(
+        "queue+handler latency: p50 %.1f ms, p95 %.1f ms, p99 %.1f ms"
+        % tuple(percentile(latencies, p) * 1000 for p in (50, 95, 99))
+    )
+
+
+if __name__ == "__main__":
+    main()
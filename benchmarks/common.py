@@ -0,0 +1,69 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@contextlib.contextmanager
+def temp_db_path(name="bench.db"):
+    # Бенчмарки никогда не трогают рабочий users.db
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, name)
+
+
+@contextlib.contextmanager
+def quiet():
+    # Глушим отладочный вывод, чтобы он не влиял на замеры
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def report(title, ops, seconds):
+    rate = ops / seconds if seconds else float("inf")
+    print(f"{title:<40} {ops:>9} ops  {seconds:8.3f} s  {rate:12.0f} ops/s")
+    return rate
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def count_sqlite(db):
+    # Счётчики выражений SQLite (queries/commits) и выдач соединений из пула Database:
+    # trace callback ставится на все соединения, текущие и будущие
+    stats = Counter()
+    connect, acquire = db.pool._connect, db.pool.acquire
+
+    def trace(sql):
+        keyword = sql.lstrip().split(None, 1)[0].upper()
+        if keyword == "COMMIT":
+            stats["commits"] += 1
+        elif keyword not in ("BEGIN", "ROLLBACK"):
+            stats["queries"] += 1
+
+    def traced_connect():
+        conn = connect()
+        conn.set_trace_callback(trace)
+        return conn
+
+    def counted_acquire(timeout=None):
+        stats["connections"] += 1
+        return acquire(timeout)
+
+    for conn in db.pool._idle.queue:
+        conn.set_trace_callback(trace)
+    db.pool._connect = traced_connect
+    db.pool.acquire = counted_acquire
+    return stats
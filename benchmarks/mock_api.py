@@ -0,0 +1,190 @@
+# Локальный фейковый Telegram Bot API для бенчмарков и ручной проверки.
+# Отвечает на основные методы, считает вызовы и загруженные байты,
+# умеет добавлять задержку и искусственно возвращать 429.
+import email.parser
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import common  # noqa: F401  (добавляет корень репозитория в sys.path)
+
+
+def _parse_multipart(content_type, body):
+    message = email.parser.BytesParser().parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    fields, files = {}, {}
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode("utf-8")
+    return fields, files
+
+
+class MockBotAPI:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, flood_every=0, retry_after=1, blocked_every=0):
+        self.latency = latency
+        self.flood_every = flood_every
+        # Чаты с chat_id, кратным blocked_every, «заблокировали бота» и получают 403
+        self.blocked_every = blocked_every
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self.requests = []  # (time.monotonic(), method, params), если record_requests
+        self.record_requests = False
+        self.updates = []
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        # Формат apihelper.API_URL: {0} — токен, {1} — метод
+        return self.base_url + "/bot{0}/{1}"
+
+    def install(self):
+        from telebot import apihelper, asyncio_helper
+        apihelper.API_URL = self.api_url
+        asyncio_helper.API_URL = self.api_url
+        return self
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.uploaded_bytes = 0
+            self.requests.clear()
+            self._total = 0
+
+    def _message(self, params, **extra):
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "mock"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        message.update(extra)
+        return message
+
+    def handle(self, method, params, files):
+        with self._lock:
+            self.calls[method] += 1
+            self._total += 1
+            total = self._total
+            self.uploaded_bytes += sum(len(data) for data in files.values())
+            if self.record_requests:
+                self.requests.append((time.monotonic(), method, params))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.flood_every and method != "getUpdates" and total % self.flood_every == 0:
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+
+        chat_id = params.get("chat_id")
+        if self.blocked_every and chat_id and int(chat_id) % self.blocked_every == 0:
+            return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "mock", "username": "mock_bot"}}
+        if method == "getUpdates":
+            with self._lock:
+                updates, self.updates = self.updates, []
+            return 200, {"ok": True, "result": updates}
+        if method == "sendPhoto":
+            if "photo" in files:
+                file_id = "photo-" + hashlib.sha1(files["photo"]).hexdigest()[:16]
+            else:
+                file_id = params.get("photo", "")
+                if not file_id.startswith("photo-"):
+                    return 400, {"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier/HTTP URL specified"}
+            photo = [{"file_id": file_id, "file_unique_id": file_id[-8:], "width": 800, "height": 600}]
+            return 200, {"ok": True, "result": self._message(params, photo=photo)}
+        if method in ("sendMessage", "editMessageText"):
+            return 200, {"ok": True, "result": self._message(params)}
+        return 200, {"ok": True, "result": True}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                url = urlsplit(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                files = {}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    fields, files = _parse_multipart(content_type, body)
+                    params.update(fields)
+                elif content_type.startswith("application/x-www-form-urlencoded"):
+                    params.update(parse_qsl(body.decode("utf-8")))
+                elif content_type.startswith("application/json") and body:
+                    params.update(json.loads(body))
+                status, payload = api.handle(method, params, files)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--flood-every", type=int, default=0)
+    args = parser.parse_args()
+    server = MockBotAPI(port=args.port, latency=args.latency, flood_every=args.flood_every)
+    print(f"Mock Bot API: {server.api_url}")
+    server._server.serve_forever()
@@ -0,0 +1,45 @@
+# Синтетические апдейты Telegram для бенчмарков
+import itertools
+import time
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1000)
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "language_code": "ru"}
+
+
+def _message(user_id, text):
+    return {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text,
+    }
+
+
+def message_update(user_id, text):
+    message = _message(user_id, text)
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def callback_update(user_id, data):
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "message": _message(user_id, "menu"),
+            "data": data,
+        },
+    }
+
+
+def to_updates(raw_updates):
+    from telebot import types
+    return [types.Update.de_json(raw) for raw in raw_updates]
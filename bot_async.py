@@ -0,0 +1,206 @@
+# Асинхронный режим бота на AsyncTeleBot.
+# Как и в main.py, бот собирается фабрикой create_app(): импорт модуля ничего
+# не создаёт и не открывает users.db.
+# Запуск: python bot_async.py (или BOT_MODE=async python main.py)
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import TYPE_CHECKING
+
+from instrumentation import callback_branch, get_logger, handler_timed, setup_logging, setup_metrics_export
+from views import (
+    AMOUNT_INVALID, AMOUNT_NOT_POSITIVE, BANK_REQUISITES, CALLBACK_FAILED, MENU_HINT, PAYMENT_FAILED,
+    PROFILE_INPUTS, START_FAILED, callback_replies, history_query, history_replies, is_history_callback,
+    lang_changed_replies, payment_replies, profile_updated_replies, register_replies, start_replies,
+)
+
+if TYPE_CHECKING:
+    from telebot import types
+
+log = get_logger("bot_async")
+
+# Заполняются в create_app()
+bot = None
+db = None
+sender = None
+locales = None
+keyboards = None
+photos = None
+conversation = None
+
+
+def create_app(token=None, db_name="users.db"):
+    # Собирает бота и регистрирует обработчики; повторный вызов возвращает тот же бот
+    global bot, db, sender, locales, keyboards, photos, conversation
+    if bot is not None:
+        return bot
+    from dotenv import load_dotenv
+    from telebot.async_telebot import AsyncTeleBot
+
+    from database import AsyncDatabase, Database
+    from i18n import LocaleRegistry
+    from keyboards import KeyboardCache
+    from media import AsyncPhotoCache
+    from sender import AsyncSendScheduler
+    from states import ConversationStates, create_storage
+
+    load_dotenv()
+    app = AsyncTeleBot(token or os.getenv("BOT_TOKEN"))
+    db = AsyncDatabase(Database(db_name))
+    # Те же лимиты Telegram, retry_after и склейка, что и в main.py (SEND_SCHEDULER=0 — напрямую)
+    sender = AsyncSendScheduler.from_env(app).install(app) if os.getenv("SEND_SCHEDULER", "1") != "0" else None
+
+    locales = LocaleRegistry(hot_reload=os.getenv("LOCALE_HOT_RELOAD") == "1")
+    keyboards = KeyboardCache(locales)
+    photos = AsyncPhotoCache(app, db.db)
+    # В AsyncTeleBot нет register_next_step_handler — ожидаемый ввод хранится в
+    # ConversationStates; обращения к хранилищу идут через пул потоков базы
+    conversation = ConversationStates(create_storage(db.db))
+    conversation.handlers.update({
+        "payment_amount": handle_payment_amount,
+        "name": handle_name_input,
+        "address": handle_address_input,
+    })
+
+    # Порядок регистрации = порядок проверки фильтров
+    app.register_message_handler(conversation_handler, func=has_conversation_state)
+    app.register_message_handler(start_handler, commands=["start"])
+    app.register_callback_query_handler(callback_handler, func=lambda call: True)
+    app.register_message_handler(debug_text_handler, content_types=["text"])
+    bot = app
+    return bot
+
+
+async def close_app():
+    if sender is not None:
+        await sender.close()
+    if bot is not None:
+        await bot.close_session()
+    if db is not None:
+        await db.close()
+
+
+async def send_replies(chat_id, replies, call=None):
+    # То же, что main.send_replies, но с await
+    for reply in replies:
+        if reply.action == "photo":
+            try:
+                await photos.send_photo(chat_id, reply.photo, caption=reply.text)
+            except FileNotFoundError:
+                await bot.send_message(chat_id, reply.fallback)
+        elif reply.action == "edit":
+            await bot.edit_message_text(text=reply.text, chat_id=chat_id, message_id=call.message.message_id, **reply.send_kwargs())
+        elif reply.action == "answer":
+            await bot.answer_callback_query(call.id, reply.text)
+        else:
+            await bot.send_message(chat_id, reply.text, **reply.send_kwargs())
+        if reply.state:
+            state, data = reply.state
+            await db.run(conversation.set, chat_id, state, **data)
+
+# Обработчики
+async def has_conversation_state(message):
+    return await db.run(conversation.has_state, message.chat.id)
+
+@handler_timed("conversation_handler")
+async def conversation_handler(message: types.Message):
+    entry = await db.run(conversation.pop, message.chat.id)
+    if entry is None:
+        return
+    state, data = entry
+    await conversation.handlers[state](message, **data)
+
+@handler_timed("start_handler")
+async def start_handler(message: types.Message):
+    user_id = message.from_user.id
+    log.debug("start", user_id=user_id)
+    try:
+        user_data, created = await db.get_or_create_user(user_id)
+        if created:
+            log.info("user_registered", user_id=user_id)
+        await send_replies(message.chat.id, start_replies(user_data, locales, keyboards))
+    except Exception:
+        log.exception("start_handler_failed", user_id=user_id)
+        await bot.send_message(message.chat.id, START_FAILED)
+
+@handler_timed("callback_handler", lambda call: {"branch": callback_branch(call.data)})
+async def callback_handler(call: types.CallbackQuery):
+    user_id = call.from_user.id
+    data = call.data
+    log.debug("callback", user_id=user_id, data=data)
+    user = await db.get_user(user_id)
+
+    try:
+        if data == "register":
+            user_data, created = await db.get_or_create_user(user_id)
+            if created:
+                log.info("user_registered", user_id=user_id)
+            replies = register_replies(user, user_data, created, locales, keyboards)
+        elif data.startswith("lang_"):
+            replies = lang_changed_replies(await db.update_lang_returning(user_id, data.split("_")[1]), locales, keyboards)
+        elif user and is_history_callback(data):
+            before, after, limit = history_query(data)
+            rows = await db.get_transactions(user_id, before=before, after=after, limit=limit)
+            replies = history_replies(data, rows, user, locales)
+        else:
+            replies = callback_replies(data, user, locales, keyboards)
+        await send_replies(call.message.chat.id, replies, call)
+    except Exception:
+        log.exception("callback_handler_failed", user_id=user_id, data=data)
+        await bot.answer_callback_query(call.id, CALLBACK_FAILED)
+
+@handler_timed("handle_payment")
+async def handle_payment_amount(message, data):
+    user_id = message.from_user.id
+    try:
+        amount = float(message.text)
+        if amount <= 0:
+            await bot.send_message(user_id, AMOUNT_NOT_POSITIVE)
+            return
+        await db.add_transaction(user_id, BANK_REQUISITES[data]["name"], amount)
+        await send_replies(user_id, payment_replies(data, amount, await db.get_user(user_id), keyboards))
+    except ValueError:
+        await bot.send_message(user_id, AMOUNT_INVALID)
+    except Exception:
+        log.exception("handle_payment_failed", user_id=user_id)
+        await bot.send_message(user_id, PAYMENT_FAILED)
+
+async def _update_profile_field(message, field, update):
+    user_id = message.from_user.id
+    try:
+        await send_replies(message.chat.id, profile_updated_replies(field, await update(user_id, message.text), locales))
+    except Exception:
+        log.exception("profile_update_failed", user_id=user_id, field=field)
+        await bot.send_message(message.chat.id, PROFILE_INPUTS[field][1])
+
+@handler_timed("handle_name_input")
+async def handle_name_input(message):
+    await _update_profile_field(message, "name", db.update_name_returning)
+
+@handler_timed("handle_address_input")
+async def handle_address_input(message):
+    await _update_profile_field(message, "address", db.update_address_returning)
+
+@handler_timed("debug_text_handler")
+async def debug_text_handler(message):
+    log.debug("unexpected_text", user_id=message.from_user.id)
+    await bot.send_message(message.chat.id, MENU_HINT)
+
+async def run():
+    create_app()
+    try:
+        warm_up_chat = os.getenv("REQUISITES_WARMUP_CHAT_ID")
+        if warm_up_chat:
+            await photos.warm_up([info["image_path"] for info in BANK_REQUISITES.values()], int(warm_up_chat))
+        await bot.infinity_polling(timeout=30)
+    finally:
+        await close_app()
+
+def main():
+    setup_logging()
+    setup_metrics_export()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
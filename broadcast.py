@@ -0,0 +1,197 @@
+# Массовая рассылка по таблице users. Пользователи читаются страницами по
+# первичному ключу, текст берётся по языку пользователя, отправка идёт через
+# SendScheduler с приоритетом BROADCAST (ответы пользователям обгоняют рассылку).
+# Прогресс сохраняется в таблице broadcasts: после падения рассылка продолжается
+# с last_user_id, повторно могут уйти не больше max_in_flight сообщений.
+#
+# CLI только создаёт рассылку, а отправляет её процесс бота (main.create_app()
+# запускает Broadcaster.watch()): рассылка и ответы пользователям делят один
+# планировщик, поэтому общий лимит Telegram не превышается и приоритеты работают.
+# Запуск: python broadcast.py --key instruction_text
+#         python broadcast.py --text ru="Новые реквизиты" --text kg="Жаңы реквизиттер"
+#         python broadcast.py --resume --standalone   # отправить отсюда, только при остановленном боте
+import argparse
+import os
+import threading
+import time
+from collections import deque
+
+from telebot.apihelper import ApiTelegramException
+
+from instrumentation import get_logger, metrics
+from sender import BROADCAST
+
+log = get_logger(__name__)
+
+
+class Broadcaster:
+    def __init__(self, db, sender, locales, max_in_flight=1000, page_size=1000, checkpoint_every=1000):
+        self.db = db
+        self.sender = sender
+        self.locales = locales
+        self.max_in_flight = max_in_flight
+        self.page_size = page_size
+        self.checkpoint_every = checkpoint_every
+        self._stop = threading.Event()
+        self._thread = None
+
+    def create(self, key=None, texts=None):
+        # Текст на каждый язык фиксируется при создании, чтобы продолженная
+        # рассылка отправляла то же самое, даже если локали изменились
+        if key is not None:
+            texts = {lang: self.locales.get(lang)[key] for lang in self.locales.languages()}
+        if not texts:
+            raise ValueError("Нужен ключ локали или тексты рассылки")
+        broadcast_id = self.db.create_broadcast(texts)
+        log.info("broadcast_created", broadcast_id=broadcast_id, langs=",".join(sorted(texts)))
+        return broadcast_id
+
+    def stop(self):
+        # Рассылка остановится после текущего сообщения и сохранит прогресс
+        self._stop.set()
+
+    def _render(self, texts, lang):
+        text = texts.get(self.locales.resolve(lang))
+        return text if text is not None else texts.get(self.locales.default_lang) or next(iter(texts.values()))
+
+    def run(self, broadcast_id):
+        broadcast = self.db.get_broadcast(broadcast_id)
+        if broadcast is None:
+            raise ValueError(f"Рассылка {broadcast_id} не найдена")
+        if broadcast["status"] != "running":
+            return broadcast
+        texts = broadcast["texts"]
+        rendered = {}
+        stats = {key: broadcast[key] for key in ("sent", "blocked", "failed")}
+        last_user_id = broadcast["last_user_id"]
+        # (user_id, future) в порядке user_id: контрольная точка двигается
+        # только по непрерывному завершённому префиксу
+        in_flight = deque()
+        done = 0
+        started = time.monotonic()
+        log.info("broadcast_started", broadcast_id=broadcast_id, after=last_user_id)
+
+        def settle(user_id, future):
+            try:
+                future.result()
+            except ApiTelegramException as e:
+                # 403 — пользователь заблокировал бота; ретраить бессмысленно
+                status = "blocked" if e.error_code == 403 else "failed"
+            except Exception:
+                status = "failed"
+            else:
+                status = "sent"
+            stats[status] += 1
+            metrics.inc("bot_broadcast_messages_total", status=status)
+            return user_id
+
+        def checkpoint(status="running"):
+            self.db.save_broadcast_progress(broadcast_id, last_user_id, status=status, **stats)
+            elapsed = time.monotonic() - started
+            log.info("broadcast_progress", broadcast_id=broadcast_id, last_user_id=last_user_id,
+                     rate=round(done / elapsed, 1) if elapsed else 0.0, **stats)
+
+        finished = False
+        try:
+            for user_id, lang in self.db.iter_user_langs(after=last_user_id, page_size=self.page_size):
+                if self._stop.is_set():
+                    break
+                text = rendered.get(lang)
+                if text is None:
+                    text = rendered[lang] = self._render(texts, lang)
+                in_flight.append((user_id, self.sender.send_message(user_id, text, priority=BROADCAST)))
+                while in_flight and (len(in_flight) > self.max_in_flight or in_flight[0][1].done()):
+                    last_user_id = settle(*in_flight.popleft())
+                    done += 1
+                    if done % self.checkpoint_every == 0:
+                        checkpoint()
+            else:
+                finished = True
+            # Уже поставленные в очередь сообщения всё равно уйдут — дожидаемся их
+            while in_flight:
+                last_user_id = settle(*in_flight.popleft())
+                done += 1
+        finally:
+            # При падении несохранённые сообщения остаются за контрольной точкой и уйдут при продолжении
+            checkpoint("done" if finished else "running")
+        elapsed = time.monotonic() - started
+        log.info("broadcast_finished" if finished else "broadcast_stopped", broadcast_id=broadcast_id,
+                 elapsed=round(elapsed, 1), **stats)
+        return dict(self.db.get_broadcast(broadcast_id), elapsed=elapsed)
+
+    def resume(self):
+        # Продолжает все рассылки, прерванные падением или остановкой
+        return [self.run(broadcast_id) for broadcast_id in self.db.unfinished_broadcasts()]
+
+    def watch(self, interval=5.0):
+        # Фоновый поток в процессе бота: подхватывает рассылки, созданные из CLI
+        # или прерванные при прошлом запуске
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.resume()
+                except Exception:
+                    log.exception("broadcast_watch_failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="broadcast-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        # Останавливает watch(); прогресс текущей рассылки сохраняется
+        self.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main():
+    import telebot
+    from dotenv import load_dotenv
+
+    from database import Database
+    from i18n import LocaleRegistry
+    from instrumentation import setup_logging
+    from sender import SendScheduler
+
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--key", help="ключ локали с текстом рассылки")
+    group.add_argument("--text", action="append", metavar="LANG=TEXT", help="текст для языка (можно несколько)")
+    group.add_argument("--resume", action="store_true", help="продолжить незавершённые рассылки (с --standalone)")
+    parser.add_argument(
+        "--standalone", action="store_true",
+        help="отправлять из этого процесса с полным SEND_GLOBAL_RATE — только когда бот не запущен",
+    )
+    args = parser.parse_args()
+    if args.resume and not args.standalone:
+        parser.error("незавершённые рассылки продолжает запущенный бот; без него нужен --standalone")
+
+    load_dotenv()
+    setup_logging()
+    db = Database()
+    if not args.standalone:
+        try:
+            texts = dict(item.split("=", 1) for item in args.text) if args.text else None
+            Broadcaster(db, None, LocaleRegistry()).create(key=args.key, texts=texts)
+        finally:
+            db.close()
+        return
+
+    sender = SendScheduler.from_env(telebot.TeleBot(os.getenv("BOT_TOKEN")))
+    broadcaster = Broadcaster(db, sender, LocaleRegistry())
+    try:
+        if args.resume:
+            broadcaster.resume()
+        else:
+            texts = dict(item.split("=", 1) for item in args.text) if args.text else None
+            broadcaster.run(broadcaster.create(key=args.key, texts=texts))
+    except KeyboardInterrupt:
+        log.info("broadcast_interrupted")
+    finally:
+        sender.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    # Потокобезопасный LRU-кэш с ограничением по размеру и времени жизни записи
+    def __init__(self, maxsize=100_000, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Поколения записей: счётчик растёт на каждой записи, _written хранит
+        # поколение последней записи ключа (не больше maxsize ключей; всё, что
+        # вытеснено, не новее _floor). По ним fill() отбрасывает данные, прочитанные
+        # из базы до того, как другой поток записал этот ключ
+        self._generation = 0
+        self._written = OrderedDict()
+        self._floor = 0
+
+    def get(self, key, default=_MISSING):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self):
+        # Снимок поколения перед чтением из базы — для fill() и set()
+        with self._lock:
+            return self._generation
+
+    def _written_since(self, key, generation):
+        return generation < self._floor or self._written.get(key, 0) > generation
+
+    def _bump(self, key):
+        self._generation += 1
+        self._written[key] = self._generation
+        self._written.move_to_end(key)
+        if len(self._written) > self.maxsize:
+            _, self._floor = self._written.popitem(last=False)
+
+    def _store(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, value, generation=None):
+        # Запись после изменения в базе. Если с generation ключ успел записать
+        # другой поток, неизвестно, чьё значение новее — запись удаляется
+        with self._lock:
+            if generation is not None and self._written_since(key, generation):
+                self._data.pop(key, None)
+            else:
+                self._store(key, value)
+            self._bump(key)
+
+    def fill(self, key, value, generation):
+        # Заполнение после промаха: пропускается, если ключ записали после generation
+        with self._lock:
+            if self._written_since(key, generation):
+                return False
+            self._store(key, value)
+            return True
+
+    def update(self, key, func):
+        # Обновляет значение, только если оно уже есть в кэше
+        with self._lock:
+            self._bump(key)
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return
+            value, expires_at = item
+            self._data[key] = (func(value), expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._bump(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._written.clear()
+            self._generation += 1
+            self._floor = self._generation
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
@@ -1,14 +1,305 @@
+import asyncio
+import functools
+import json
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 
+from cache import LRUCache
+from instrumentation import DB_METRIC, db_timed, get_logger, metrics, timer
+
+log = get_logger(__name__)
+
+_NOT_CACHED = object()
+
+# Профиль только что зарегистрированного пользователя
+_NEW_PROFILE = {"lang": "ru", "name": "", "address": ""}
+
+# Настройки SQLite по умолчанию: WAL позволяет читать параллельно с записью,
+# synchronous=NORMAL в режиме WAL не делает fsync на каждый commit
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # отрицательное значение — размер в КиБ (~16 МБ)
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+class ConnectionPool:
+    # Ограниченный пул соединений: соединения переиспользуются между потоками
+    # TeleBot, поэтому подготовленные запросы остаются в кэше sqlite3
+    def __init__(self, db_name, size=8, pragmas=None, cached_statements=128):
+        self.db_name = db_name
+        self.size = size
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Все соединения заняты — ждём, пока какое-нибудь вернут
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+_STOP = object()
+
+# Миграции схемы: номер миграции = индекс + 1, применённая версия хранится в PRAGMA user_version
+MIGRATIONS = [
+    # 1: составной индекс для постраничной истории транзакций пользователя
+    ["CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date)"],
+    # 2: рассылки и их контрольные точки (last_user_id — все id до него уже обработаны)
+    ["""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            texts TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """],
+    # 3: время транзакции в секундах эпохи (date — локальное время строкой) и
+    # агрегаты для отчётов, заполненные по уже существующим строкам
+    [
+        "ALTER TABLE transactions ADD COLUMN ts INTEGER",
+        "UPDATE transactions SET ts = CAST(strftime('%s', date, 'utc') AS INTEGER) WHERE ts IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_ts ON transactions (ts)",
+        """
+            CREATE TABLE IF NOT EXISTS daily_bank_totals (
+                day TEXT NOT NULL,
+                bank TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                amount REAL NOT NULL,
+                PRIMARY KEY (day, bank)
+            ) WITHOUT ROWID
+        """,
+        """
+            INSERT INTO daily_bank_totals (day, bank, count, amount)
+            SELECT substr(date, 1, 10), bank, COUNT(*), SUM(amount) FROM transactions GROUP BY 1, 2
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS user_totals (
+                user_id INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL,
+                amount REAL NOT NULL,
+                first_ts INTEGER,
+                last_ts INTEGER
+            )
+        """,
+        """
+            INSERT INTO user_totals (user_id, count, amount, first_ts, last_ts)
+            SELECT user_id, COUNT(*), SUM(amount), MIN(ts), MAX(ts) FROM transactions GROUP BY user_id
+        """,
+    ],
+]
+
+# Агрегаты обновляются в той же транзакции, что и вставка пачки строк
+_DAILY_TOTALS_UPSERT = (
+    "INSERT INTO daily_bank_totals (day, bank, count, amount) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(day, bank) DO UPDATE SET count = count + excluded.count, amount = amount + excluded.amount"
+)
+_USER_TOTALS_UPSERT = (
+    "INSERT INTO user_totals (user_id, count, amount, first_ts, last_ts) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET count = count + excluded.count, amount = amount + excluded.amount, "
+    "first_ts = min(first_ts, excluded.first_ts), last_ts = max(last_ts, excluded.last_ts)"
+)
+
+
+def _aggregate(rows):
+    # Строки (user_id, bank, amount, date, ts) -> суммы по (день, банк) и по пользователю
+    daily, users = {}, {}
+    for user_id, bank, amount, date, ts in rows:
+        key = (date[:10], bank)
+        count, total = daily.get(key, (0, 0.0))
+        daily[key] = (count + 1, total + amount)
+        count, total, first_ts, last_ts = users.get(user_id, (0, 0.0, ts, ts))
+        users[user_id] = (count + 1, total + amount, min(first_ts, ts), max(last_ts, ts))
+    return (
+        [(day, bank, count, total) for (day, bank), (count, total) in daily.items()],
+        [(user_id, *totals) for user_id, totals in users.items()],
+    )
+
+
+class TransactionWriter:
+    # Фоновая запись транзакций: строки копятся в очереди и пишутся пачкой —
+    # один executemany и один commit на пачку. Пачка уходит, когда набралось
+    # max_batch_size строк или самая старая строка ждёт дольше max_latency секунд.
+    def __init__(self, pool, max_batch_size=256, max_latency=0.05):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._pending = 0  # строки, которые ещё не закоммичены
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="transaction-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        # Future завершается после commit; .result() — если нужно дождаться записи.
+        # Проверка и put под одной блокировкой с close(): иначе строка может лечь
+        # в очередь после _STOP, и её уже никто не запишет
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TransactionWriter остановлен")
+            self._pending += 1
+            self._queue.put((row, future))
+        return future
+
+    def flush(self, timeout=None):
+        # Пишет всё, что уже в очереди, не дожидаясь max_latency
+        future = Future()
+        with self._lock:
+            if self._closed or not self._pending:
+                return
+            self._queue.put((None, future))
+        future.result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_latency
+            while item[0] is not None and len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        rows = [row for row, _ in batch if row is not None]
+        try:
+            if rows:
+                with timer(DB_METRIC, method="transaction_batch"), self.pool.connection() as conn:
+                    conn.executemany(
+                        "INSERT INTO transactions (user_id, bank, amount, date, ts) VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    daily, users = _aggregate(rows)
+                    conn.executemany(_DAILY_TOTALS_UPSERT, daily)
+                    conn.executemany(_USER_TOTALS_UPSERT, users)
+                    conn.commit()
+        except Exception as e:
+            log.exception("transaction_batch_failed", rows=len(rows))
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for _, future in batch:
+                future.set_result(None)
+        finally:
+            with self._lock:
+                self._pending -= len(rows)
+
+    def close(self):
+        # Дописывает всё, что осталось в очереди, и останавливает поток
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+
 class Database:
-    def __init__(self):
-        self.db_name = 'users.db'
+    def __init__(self, db_name='users.db', pool_size=8, pragmas=None, cache_size=100_000, cache_ttl=600.0,
+                 write_batch_size=256, write_max_latency=0.05):
+        self.db_name = db_name
+        self.pool = ConnectionPool(db_name, size=pool_size, pragmas=pragmas)
+        # Кэш профилей: user_id -> dict профиля или None, если пользователя нет
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        # Счётчики кэша в /metrics — по ним подбирается cache_size в продакшене
+        for stat in ("size", "hits", "misses", "evictions", "expirations"):
+            metrics.gauge(f"bot_profile_cache_{stat}", lambda stat=stat: self.cache.stats()[stat])
         self._init_db()
+        self.transactions = TransactionWriter(self.pool, max_batch_size=write_batch_size, max_latency=write_max_latency)
 
     def _init_db(self):
-        # Создаём таблицы при инициализации
-        conn = sqlite3.connect(self.db_name)
+        # Создаём таблицы при инициализации. Если схема уже на последней
+        # миграции, DDL не выполняется — только чтение PRAGMA user_version
+        conn = self.pool.acquire()
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < len(MIGRATIONS):
+                self._create_schema(conn)
+        finally:
+            self.pool.release(conn)
+
+    def _create_schema(self, conn):
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -28,84 +319,366 @@ class Database:
                 FOREIGN KEY (user_id) REFERENCES users(user_id)
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_states (
+                chat_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                data TEXT,
+                expires_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversation_states_expires ON conversation_states (expires_at)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_ids (
+                sha256 TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL
+            )
+        """)
         conn.commit()
-        conn.close()
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            log.info("migration_applied", version=number)
 
     def _get_connection(self):
-        # Создаём новое соединение для каждого вызова
-        return sqlite3.connect(self.db_name)
+        # Соединение берётся из пула и возвращается туда через with
+        return self.pool.connection()
+
+    def _update_cached(self, user_id, field, value):
+        # write-through: меняем поле в кэше, только если профиль уже закэширован
+        self.cache.update(user_id, lambda profile: {**profile, field: value} if profile else profile)
 
+    # user_exists и add_user — обёртки без @db_timed: время учитывают get_user и
+    # get_or_create_user, иначе каждый вызов попадал бы в гистограмму дважды
     def user_exists(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone() is not None
-        conn.close()
-        return result
+        return self.get_user(user_id) is not None
 
     def add_user(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO users (user_id, lang, name, address) VALUES (?, 'ru', '', '')",
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
-        print(f"[DEBUG] add_user: Пользователь {user_id} добавлен")
+        # Существующий профиль не перезаписывается (раньше INSERT OR REPLACE стирал имя и адрес)
+        self.get_or_create_user(user_id)
 
+    @db_timed
     def get_user(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT lang, name, address FROM users WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return {"lang": row[0], "name": row[1], "address": row[2]} if row else None
+        profile = self.cache.get(user_id, _NOT_CACHED)
+        if profile is not _NOT_CACHED:
+            return dict(profile) if profile else None
+        # Если пока читаем, профиль изменит другой поток, прочитанное в кэш не попадёт
+        generation = self.cache.generation()
+        with self._get_connection() as conn:
+            cursor = conn.execute("SELECT lang, name, address FROM users WHERE user_id = ?", (user_id,))
+            row = cursor.fetchone()
+        profile = {"lang": row[0], "name": row[1], "address": row[2]} if row else None
+        self.cache.fill(user_id, profile, generation)
+        return dict(profile) if profile else None
+
+    @db_timed
+    def get_or_create_user(self, user_id):
+        # (профиль, created): один SELECT для существующего пользователя,
+        # для нового — INSERT ... ON CONFLICT DO NOTHING RETURNING и один commit
+        profile = self.cache.get(user_id, _NOT_CACHED)
+        if profile is not _NOT_CACHED and profile:
+            return dict(profile), False
+        created = False
+        generation = self.cache.generation()
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT lang, name, address FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "INSERT INTO users (user_id, lang, name, address) VALUES (?, 'ru', '', '') "
+                    "ON CONFLICT(user_id) DO NOTHING RETURNING lang, name, address",
+                    (user_id,)
+                ).fetchone()
+                conn.commit()
+                created = row is not None
+                if row is None:
+                    # Пользователя успел создать другой поток
+                    row = conn.execute("SELECT lang, name, address FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        profile = {"lang": row[0], "name": row[1], "address": row[2]}
+        if created:
+            self.cache.set(user_id, profile, generation)
+        else:
+            self.cache.fill(user_id, profile, generation)
+        if created:
+            log.debug("user_added", user_id=user_id)
+        return dict(profile), created
+
+    def _upsert_returning(self, user_id, field, value):
+        # Одно атомарное выражение: создаёт пользователя, если его нет, меняет поле
+        # и возвращает профиль целиком
+        profile = dict(_NEW_PROFILE, **{field: value})
+        generation = self.cache.generation()
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "INSERT INTO users (user_id, lang, name, address) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT(user_id) DO UPDATE SET {field} = excluded.{field} "
+                "RETURNING lang, name, address",
+                (user_id, profile["lang"], profile["name"], profile["address"])
+            ).fetchone()
+            conn.commit()
+        profile = {"lang": row[0], "name": row[1], "address": row[2]}
+        self.cache.set(user_id, profile, generation)
+        log.debug(f"{field}_updated", user_id=user_id)
+        return dict(profile)
+
+    @db_timed
+    def update_name_returning(self, user_id, name):
+        return self._upsert_returning(user_id, "name", name)
+
+    @db_timed
+    def update_address_returning(self, user_id, address):
+        return self._upsert_returning(user_id, "address", address)
 
+    @db_timed
+    def update_lang_returning(self, user_id, lang):
+        return self._upsert_returning(user_id, "lang", lang)
+
+    @db_timed
     def update_name(self, user_id, name):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET name = ? WHERE user_id = ?", (name, user_id))
-        conn.commit()
-        conn.close()
-        print(f"[DEBUG] update_name: Имя для {user_id} обновлено на '{name}'")
+        with self._get_connection() as conn:
+            conn.execute("UPDATE users SET name = ? WHERE user_id = ?", (name, user_id))
+            conn.commit()
+        self._update_cached(user_id, "name", name)
+        log.debug("name_updated", user_id=user_id)
 
+    @db_timed
     def update_address(self, user_id, address):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET address = ? WHERE user_id = ?", (address, user_id))
-        conn.commit()
-        conn.close()
-        print(f"[DEBUG] update_address: Адрес для {user_id} обновлён на '{address}'")
+        with self._get_connection() as conn:
+            conn.execute("UPDATE users SET address = ? WHERE user_id = ?", (address, user_id))
+            conn.commit()
+        self._update_cached(user_id, "address", address)
+        log.debug("address_updated", user_id=user_id)
 
+    @db_timed
     def update_lang(self, user_id, lang):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET lang = ? WHERE user_id = ?", (lang, user_id))
-        conn.commit()
-        conn.close()
-        print(f"[DEBUG] update_lang: Язык для {user_id} обновлён на '{lang}'")
+        with self._get_connection() as conn:
+            conn.execute("UPDATE users SET lang = ? WHERE user_id = ?", (lang, user_id))
+            conn.commit()
+        self._update_cached(user_id, "lang", lang)
+        log.debug("lang_updated", user_id=user_id, lang=lang)
 
-    def add_transaction(self, user_id, bank, amount):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute(
-            "INSERT INTO transactions (user_id, bank, amount, date) VALUES (?, ?, ?, ?)",
-            (user_id, bank, amount, date)
+    @db_timed
+    def add_transaction(self, user_id, bank, amount, wait=False):
+        # Запись идёт в фоне пачками; wait=True — дождаться commit.
+        # Возвращает Future, который завершится после записи в базу
+        ts = int(time.time())
+        date = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+        future = self.transactions.submit((user_id, bank, amount, date, ts))
+        if wait:
+            future.result()
+        log.debug("transaction_queued", user_id=user_id, bank=bank)
+        return future
+
+    @db_timed
+    def get_transactions(self, user_id, before=None, after=None, limit=None):
+        # Строки (bank, amount, date, id) от новых к старым.
+        # Keyset-пагинация по индексу (user_id, date): before — id транзакции,
+        # старее которой нужна страница, after — id, новее которой
+        # Сначала дописываем очередь, чтобы только что созданная транзакция попала в историю
+        self.transactions.flush()
+        sql = "SELECT bank, amount, date, id FROM transactions WHERE user_id = ?"
+        params = [user_id]
+        if before is not None:
+            sql += " AND (date, id) < (SELECT date, id FROM transactions WHERE id = ? AND user_id = ?)"
+            params += [before, user_id]
+        elif after is not None:
+            sql += " AND (date, id) > (SELECT date, id FROM transactions WHERE id = ? AND user_id = ?)"
+            params += [after, user_id]
+        # Для after берём ближайшие более новые строки, поэтому идём по возрастанию
+        sql += " ORDER BY date ASC, id ASC" if after is not None else " ORDER BY date DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if after is not None:
+            rows.reverse()
+        return rows
+
+    @db_timed
+    def get_file_id(self, sha256):
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT file_id FROM file_ids WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    @db_timed
+    def save_file_id(self, sha256, file_id):
+        with self._get_connection() as conn:
+            conn.execute(
+                "INSERT INTO file_ids (sha256, file_id) VALUES (?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET file_id = excluded.file_id",
+                (sha256, file_id)
+            )
+            conn.commit()
+
+    @db_timed
+    def delete_file_id(self, sha256):
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM file_ids WHERE sha256 = ?", (sha256,))
+            conn.commit()
+
+    @db_timed
+    def set_state(self, chat_id, state, data, expires_at):
+        with self._get_connection() as conn:
+            conn.execute(
+                "INSERT INTO conversation_states (chat_id, state, data, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET state = excluded.state, data = excluded.data, expires_at = excluded.expires_at",
+                (chat_id, state, data, expires_at)
+            )
+            conn.commit()
+
+    @db_timed
+    def get_state(self, chat_id, now):
+        with self._get_connection() as conn:
+            return conn.execute(
+                "SELECT state, data FROM conversation_states WHERE chat_id = ? AND expires_at > ?",
+                (chat_id, now)
+            ).fetchone()
+
+    @db_timed
+    def pop_state(self, chat_id, now):
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "DELETE FROM conversation_states WHERE chat_id = ? RETURNING state, data, expires_at",
+                (chat_id,)
+            ).fetchone()
+            conn.commit()
+        return row[:2] if row and row[2] > now else None
+
+    @db_timed
+    def purge_expired_states(self, now):
+        with self._get_connection() as conn:
+            deleted = conn.execute("DELETE FROM conversation_states WHERE expires_at <= ?", (now,)).rowcount
+            conn.commit()
+        return deleted
+
+    def iter_user_langs(self, after=0, page_size=1000):
+        # Все (user_id, lang) по возрастанию user_id страницами по первичному ключу:
+        # соединение занято только на время одной страницы, память не зависит от числа пользователей
+        while True:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    "SELECT user_id, lang FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (after, page_size)
+                ).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    @db_timed
+    def create_broadcast(self, texts):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._get_connection() as conn:
+            broadcast_id = conn.execute(
+                "INSERT INTO broadcasts (texts, created_at, updated_at) VALUES (?, ?, ?)",
+                (json.dumps(texts, ensure_ascii=False), now, now)
+            ).lastrowid
+            conn.commit()
+        return broadcast_id
+
+    @db_timed
+    def get_broadcast(self, broadcast_id):
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT texts, status, last_user_id, sent, blocked, failed FROM broadcasts WHERE id = ?",
+                (broadcast_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": broadcast_id, "texts": json.loads(row[0]), "status": row[1],
+            "last_user_id": row[2], "sent": row[3], "blocked": row[4], "failed": row[5],
+        }
+
+    @db_timed
+    def unfinished_broadcasts(self):
+        with self._get_connection() as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id")]
+
+    @db_timed
+    def save_broadcast_progress(self, broadcast_id, last_user_id, sent, blocked, failed, status="running"):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._get_connection() as conn:
+            conn.execute(
+                "UPDATE broadcasts SET last_user_id = ?, sent = ?, blocked = ?, failed = ?, status = ?, updated_at = ? "
+                "WHERE id = ?",
+                (last_user_id, sent, blocked, failed, status, now, broadcast_id)
+            )
+            conn.commit()
+
+    def _stream(self, sql, params=(), chunk_size=10_000):
+        # Результат запроса пачками по chunk_size строк: в памяти одна пачка,
+        # соединение занято, пока генератор не дочитан или не закрыт
+        self.transactions.flush()
+        with self._get_connection() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def stream_daily_totals(self, since_day=None, until_day=None, chunk_size=10_000):
+        # (day, bank, count, amount); since_day/until_day — 'YYYY-MM-DD' включительно
+        return self._stream(
+            "SELECT day, bank, count, amount FROM daily_bank_totals "
+            "WHERE day >= ? AND day <= ? ORDER BY day, bank",
+            (since_day or "0000-00-00", until_day or "9999-99-99"), chunk_size
         )
-        conn.commit()
-        conn.close()
-        print(f"[DEBUG] add_transaction: Транзакция для {user_id} добавлена (банк: {bank}, сумма: {amount})")
 
-    def get_transactions(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT bank, amount, date FROM transactions WHERE user_id = ? ORDER BY date DESC", (user_id,))
-        result = cursor.fetchall()
-        conn.close()
-        return result
+    def stream_user_totals(self, chunk_size=10_000):
+        # (user_id, count, amount, first_ts, last_ts)
+        return self._stream(
+            "SELECT user_id, count, amount, first_ts, last_ts FROM user_totals ORDER BY user_id",
+            (), chunk_size
+        )
+
+    def stream_transactions(self, since_ts=None, until_ts=None, chunk_size=10_000):
+        # (id, user_id, bank, amount, ts) за [since_ts, until_ts) по индексу на ts
+        return self._stream(
+            "SELECT id, user_id, bank, amount, ts FROM transactions WHERE ts >= ? AND ts < ? ORDER BY ts, id",
+            (since_ts if since_ts is not None else -2 ** 63, until_ts if until_ts is not None else 2 ** 63 - 1),
+            chunk_size
+        )
 
     def close(self):
-        # Больше не нужно закрывать соединение здесь, так как мы создаём его в каждом методе
-        print("[DEBUG] Database closed")
\ No newline at end of file
+        # Дописываем очередь транзакций и закрываем все соединения пула
+        self.transactions.close()
+        self.pool.close()
+        log.info("database_closed")
+
+
+class AsyncDatabase:
+    # Асинхронная обёртка над Database: каждый вызов выполняется в отдельном
+    # пуле потоков, чтобы SQLite не блокировал цикл событий.
+    # await adb.get_user(user_id) вместо db.get_user(user_id)
+    def __init__(self, db, max_workers=4):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return wrapper
+
+    async def close(self):
+        # Дожидаемся уже отправленных запросов, затем закрываем пул соединений
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+        self.db.close()
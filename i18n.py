@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANG = "ru"
+
+# Цепочка запасных языков: если ключа нет в kg, берём его из ru
+FALLBACKS = {"kg": "ru"}
+
+# Встроенные строки на случай, если ключа нет ни в одном файле локализации
+BUILTIN_STRINGS = {
+    "welcome": "Добро пожаловать!",
+    "help": "Используйте кнопки ниже:",
+    "my_profile": "Мой профиль",
+    "my_history": "Моя история",
+    "register": "Регистрация",
+    "pay": "Оплатить",
+    "back": "Назад",
+    "select_lang": "Выберите язык:",
+    "select_payment_method": "Выберите способ оплаты:",
+    "enter_amount": "Введите сумму оплаты (в KGS):",
+    "instruction_text": "Инструкция недоступна",
+    "no_name": "Имя не указано",
+    "no_address": "Адрес не указан",
+    "no_transactions": "У вас нет транзакций.",
+    "registration_success": "Вы успешно зарегистрированы!",
+    "already_registered": "Вы уже зарегистрированы.",
+    "profile_info": "Ваш профиль",
+    "your_name": "Ваше имя",
+    "your_address": "Ваш адрес",
+    "your_language": "Ваш язык",
+    "transaction_history": "Ваша история транзакций",
+    "bank": "Банк",
+    "amount": "Сумма",
+    "date": "Дата",
+    "history_newer": "⬅ Новее",
+    "history_older": "Старее ➡",
+}
+
+
+class LocaleRegistry:
+    # Все локали загружаются один раз в неизменяемые словари.
+    # При hot_reload файлы перечитываются, если у них изменился mtime
+    # (проверка не чаще раза в check_interval секунд).
+    def __init__(self, path=LOCALES_DIR, default_lang=DEFAULT_LANG, fallbacks=None,
+                 hot_reload=False, check_interval=2.0):
+        self.path = path
+        self.default_lang = default_lang
+        self.fallbacks = dict(FALLBACKS if fallbacks is None else fallbacks)
+        self.hot_reload = hot_reload
+        self.check_interval = check_interval
+        self.version = 0
+        self._locales = {}
+        self._mtimes = {}
+        self._next_check = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _scan(self):
+        mtimes = {}
+        for filename in os.listdir(self.path):
+            if filename.endswith(".json"):
+                full_path = os.path.join(self.path, filename)
+                mtimes[filename[:-5]] = os.stat(full_path).st_mtime_ns
+        return mtimes
+
+    def _chain(self, lang):
+        chain, seen = [], set()
+        while lang and lang not in seen:
+            seen.add(lang)
+            chain.append(lang)
+            lang = self.fallbacks.get(lang, self.default_lang if lang != self.default_lang else None)
+        return chain
+
+    def reload(self):
+        mtimes = self._scan()
+        raw = {}
+        for lang in mtimes:
+            with open(os.path.join(self.path, f"{lang}.json"), "r", encoding="utf-8") as f:
+                raw[lang] = json.load(f)
+
+        locales = {}
+        for lang in raw:
+            merged = dict(BUILTIN_STRINGS)
+            for fallback in reversed(self._chain(lang)):
+                merged.update(raw.get(fallback, {}))
+            locales[lang] = MappingProxyType(merged)
+        if self.default_lang not in locales:
+            locales[self.default_lang] = MappingProxyType(dict(BUILTIN_STRINGS))
+
+        with self._lock:
+            self._locales = locales
+            self._mtimes = mtimes
+            self.version += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(self)
+
+    def add_listener(self, callback):
+        # callback(registry) вызывается после каждой перезагрузки локалей
+        self._listeners.append(callback)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            changed = self._scan() != self._mtimes
+        except OSError:
+            return
+        if changed:
+            log.info("locales_changed", path=self.path)
+            try:
+                self.reload()
+            except (ValueError, OSError) as e:
+                # Файл сохранён не до конца или с ошибкой — оставляем прежние локали,
+                # _mtimes не обновился, поэтому повторим при следующей проверке
+                log.warning("locales_reload_failed", path=self.path, error=str(e))
+
+    def get(self, lang):
+        if self.hot_reload:
+            self._maybe_reload()
+        locales = self._locales
+        return locales.get(lang) or locales[self.default_lang]
+
+    def resolve(self, lang):
+        # Неизвестный язык заменяется языком по умолчанию
+        return lang if lang in self._locales else self.default_lang
+
+    def languages(self):
+        return tuple(self._locales)
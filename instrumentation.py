@@ -0,0 +1,304 @@
+# Логирование и метрики.
+# Логи структурированные (событие + поля key=value или JSON) и пишутся через
+# QueueHandler: обработчик только кладёт запись в очередь, вывод идёт в отдельном потоке.
+# Метрики — гистограммы задержек обработчиков и запросов к базе в формате Prometheus.
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import signal
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+_RESERVED_KWARGS = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+class StructLogger(logging.LoggerAdapter):
+    # log.debug("update_name", user_id=1) — именованные аргументы становятся полями записи.
+    # Уровень проверяется до форматирования, поэтому отключённый debug почти ничего не стоит
+    def __init__(self, logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _RESERVED_KWARGS}
+        kwargs["extra"] = {"fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name):
+    return StructLogger(logging.getLogger(name))
+
+
+class StructFormatter(logging.Formatter):
+    def __init__(self, fmt="text"):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        if self.fmt == "json":
+            payload = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                payload["exc"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Очередь внутри процесса: запись передаётся как есть, а форматирует её
+    # поток слушателя (стандартный prepare() форматирует прямо в обработчике)
+    def prepare(self, record):
+        return record
+
+
+_listener = None
+
+
+def setup_logging(level=None, fmt=None):
+    # LOG_LEVEL (по умолчанию INFO) и LOG_FORMAT=text|json
+    global _listener
+    if _listener is not None:
+        return
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(StructFormatter(fmt))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    root = logging.getLogger()
+    root.handlers[:] = [_QueueHandler(log_queue)]
+    root.setLevel(level)
+    # urllib3 на уровне DEBUG пишет URL запросов целиком, включая тексты сообщений пользователей
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Границы корзин гистограмм в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        # Оценка по верхней границе корзины, как histogram_quantile без интерполяции
+        counts, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+                self._help.setdefault(name, help_text)
+        return histogram
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, func, **labels):
+        # func() вызывается при каждом экспорте
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = func
+
+    @staticmethod
+    def _labels(pairs, extra=()):
+        pairs = tuple(pairs) + tuple(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        seen = set()
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                if self._help.get(name):
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{self._labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), func in gauges:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{self._labels(labels)} {func()}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+
+HANDLER_METRIC = "bot_handler_duration_seconds"
+DB_METRIC = "bot_db_query_duration_seconds"
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.histogram(name, **labels).observe(time.perf_counter() - start)
+
+
+def timed(name, label_func=None, **labels):
+    # Декоратор для обычных и async-функций; label_func(*args) -> dict доп. меток
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                extra = label_func(*args, **kwargs) if label_func else {}
+                with timer(name, **labels, **extra):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            extra = label_func(*args, **kwargs) if label_func else {}
+            with timer(name, **labels, **extra):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def handler_timed(handler, label_func=None):
+    return timed(HANDLER_METRIC, label_func=label_func, handler=handler)
+
+
+def db_timed(func):
+    return timed(DB_METRIC, method=func.__name__)(func)
+
+
+def callback_branch(data):
+    # Метка ветки callback_handler без идентификаторов, чтобы число серий было ограниченным
+    if data.startswith("history_"):
+        return "history_page"
+    if data.startswith("lang_"):
+        return "lang"
+    if data.startswith("pay_"):
+        return "pay_bank"
+    return data if data.isidentifier() and len(data) <= 32 else "other"
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    # http.server импортируется только при включённом экспорте — он заметно замедляет старт
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # GET /metrics в текстовом формате Prometheus
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+_metrics_exported = False
+
+
+def setup_metrics_export():
+    # METRICS_PORT — поднять /metrics; METRICS_DUMP_PATH — куда писать снимок по SIGUSR1
+    global _metrics_exported
+    if _metrics_exported:
+        return
+    _metrics_exported = True
+    port = os.getenv("METRICS_PORT")
+    if port:
+        start_metrics_server(int(port), host=os.getenv("METRICS_HOST", "127.0.0.1"))
+    dump_path = os.getenv("METRICS_DUMP_PATH", "metrics.prom")
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda *_: metrics.dump(dump_path))
@@ -0,0 +1,113 @@
+import threading
+
+from telebot import types
+
+def get_main_kb(locale: dict):
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(
+        types.InlineKeyboardButton(locale.get("my_profile", "Мой профиль"), callback_data="my_profile"),
+        types.InlineKeyboardButton(locale["language"], callback_data="change_lang"),
+    )
+    keyboard.row(
+        types.InlineKeyboardButton(locale["address"], callback_data="show_address"),
+        types.InlineKeyboardButton(locale.get("my_history", "Моя история"), callback_data="my_history"),
+    )
+    keyboard.row(
+        types.InlineKeyboardButton(locale.get("register", "Регистрация"), callback_data="register"),
+        types.InlineKeyboardButton(locale["support"], url="https://t.me/username"),
+        types.InlineKeyboardButton(locale["instruction"], callback_data="instruction"),
+        types.InlineKeyboardButton(locale.get("pay", "Оплатить"), callback_data="pay"),
+    )
+    return keyboard
+
+def get_profile_menu(locale: dict):
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(
+        types.InlineKeyboardButton(locale["profile"], callback_data="edit_profile"),
+        types.InlineKeyboardButton(locale.get("pay", "Оплатить"), callback_data="pay"),
+        types.InlineKeyboardButton(locale.get("my_history", "Моя история"), callback_data="my_history"),
+    )
+    keyboard.row(
+        types.InlineKeyboardButton(locale.get("back", "Назад"), callback_data="back_to_main"),
+    )
+    return keyboard
+
+def get_lang_kb(locale: dict = None):
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(
+        types.InlineKeyboardButton("Русский 🇷🇺", callback_data="lang_ru"),
+        types.InlineKeyboardButton("Кыргызский 🇰🇬", callback_data="lang_kg"),
+    )
+    return keyboard
+
+def get_payment_kb(locale: dict):
+    keyboard = types.InlineKeyboardMarkup()
+    # Кыргызские банки
+    keyboard.row(types.InlineKeyboardButton("Aiyl Bank", callback_data="pay_aiyl"))
+    keyboard.row(types.InlineKeyboardButton("RSK Bank", callback_data="pay_rsk"))
+    keyboard.row(types.InlineKeyboardButton("Bakai Bank", callback_data="pay_bakai"))
+    keyboard.row(types.InlineKeyboardButton("MBank", callback_data="pay_mbank"))
+    keyboard.row(types.InlineKeyboardButton("O!Bank (О деньги)", callback_data="pay_obank"))
+    keyboard.row(types.InlineKeyboardButton("Optima Bank", callback_data="pay_odeneg"))
+    # Российские банки и Mir
+    keyboard.row(types.InlineKeyboardButton("Сбербанк (Mir)", callback_data="pay_sber"))
+    keyboard.row(types.InlineKeyboardButton("Тинькофф (Mir)", callback_data="pay_tinkoff"))
+    keyboard.row(types.InlineKeyboardButton(locale.get("back", "Назад"), callback_data="back_to_main"))
+    return keyboard
+
+def get_edit_profile_kb(locale: dict):
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.add(types.InlineKeyboardButton(locale["change_name"], callback_data="set_name"))
+    keyboard.add(types.InlineKeyboardButton(locale["change_address"], callback_data="set_address"))
+    return keyboard
+
+def get_history_kb(locale: dict, newer=None, older=None):
+    # Меню профиля с кнопками листания истории; курсоры меняются, поэтому не кэшируется
+    keyboard = types.InlineKeyboardMarkup()
+    nav = []
+    if newer is not None:
+        nav.append(types.InlineKeyboardButton(locale.get("history_newer", "⬅ Новее"), callback_data=f"history_after_{newer}"))
+    if older is not None:
+        nav.append(types.InlineKeyboardButton(locale.get("history_older", "Старее ➡"), callback_data=f"history_before_{older}"))
+    if nav:
+        keyboard.row(*nav)
+    keyboard.inline_keyboard.extend(get_profile_menu(locale).inline_keyboard)
+    return keyboard
+
+BUILDERS = {
+    "main": get_main_kb,
+    "profile": get_profile_menu,
+    "lang": get_lang_kb,
+    "payment": get_payment_kb,
+    "edit_profile": get_edit_profile_kb,
+}
+
+
+class KeyboardCache:
+    # Клавиатуры строятся один раз на пару (клавиатура, язык) и хранятся
+    # уже сериализованными в JSON — send_message передаёт строку как есть.
+    # Кэш сбрасывается при перезагрузке реестра локалей.
+    def __init__(self, registry):
+        self.registry = registry
+        self._cache = {}
+        self._lock = threading.Lock()
+        registry.add_listener(lambda _registry: self.clear())
+
+    def get(self, name, lang):
+        lang = self.registry.resolve(lang)
+        key = (name, lang)
+        markup = self._cache.get(key)
+        if markup is None:
+            # Перезагрузка локалей может сбросить кэш, пока клавиатура строится:
+            # сохраняем её, только если версия реестра за это время не изменилась
+            version = self.registry.version
+            locale = self.registry.get(lang)
+            markup = BUILDERS[name](locale).to_json()
+            with self._lock:
+                if self.registry.version == version:
+                    self._cache[key] = markup
+        return markup
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import threading
+
+from telebot.apihelper import ApiTelegramException
+
+from instrumentation import get_logger
+from sender import result_of
+
+log = get_logger(__name__)
+
+
+class PhotoCache:
+    # Кэш Telegram file_id для картинок с реквизитами.
+    # После первой загрузки фото отправляется по file_id, без повторной выгрузки байтов.
+    # Ключ — sha256 содержимого файла, поэтому изменённая картинка загрузится заново.
+    def __init__(self, bot, db):
+        self.bot = bot
+        self.db = db
+        self._digests = {}  # path -> (mtime_ns, size, sha256)
+        self._file_ids = {}  # sha256 -> file_id
+        self._lock = threading.Lock()
+
+    def _digest(self, path):
+        st = os.stat(path)
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def _lookup(self, digest):
+        file_id = self._file_ids.get(digest)
+        if file_id is None:
+            file_id = self.db.get_file_id(digest)
+            if file_id is not None:
+                self._file_ids[digest] = file_id
+        return file_id
+
+    def _remember(self, digest, message):
+        file_id = message.photo[-1].file_id
+        with self._lock:
+            self._file_ids[digest] = file_id
+        self.db.save_file_id(digest, file_id)
+        return file_id
+
+    def _forget(self, digest):
+        with self._lock:
+            self._file_ids.pop(digest, None)
+        self.db.delete_file_id(digest)
+
+    def send_photo(self, chat_id, path, **kwargs):
+        # FileNotFoundError пробрасывается наружу, как и при open()
+        digest = self._digest(path)
+        file_id = self._lookup(digest)
+        if file_id is not None:
+            try:
+                return result_of(self.bot.send_photo(chat_id, photo=file_id, **kwargs))
+            except ApiTelegramException as e:
+                if e.error_code != 400:
+                    raise
+                # file_id больше не действителен (например, сменился токен бота) — загружаем заново
+                log.info("stale_file_id", path=path)
+                self._forget(digest)
+        with open(path, "rb") as photo:
+            # Ждём результат внутри with: планировщик читает файл уже из своего потока
+            message = result_of(self.bot.send_photo(chat_id, photo=photo, **kwargs))
+        self._remember(digest, message)
+        return message
+
+    def warm_up(self, paths, chat_id):
+        # Заранее загружает картинки в служебный чат, чтобы первый платёж не ждал выгрузки
+        for path in paths:
+            try:
+                if self._lookup(self._digest(path)) is None:
+                    self.send_photo(chat_id, path, disable_notification=True)
+            except FileNotFoundError:
+                log.error("requisites_image_missing", path=path)
+
+
+class AsyncPhotoCache(PhotoCache):
+    # То же самое для AsyncTeleBot; хэширование файла и SQLite — в отдельном потоке
+    def _resolve(self, path):
+        digest = self._digest(path)
+        return digest, self._lookup(digest)
+
+    async def send_photo(self, chat_id, path, **kwargs):
+        digest, file_id = await asyncio.to_thread(self._resolve, path)
+        if file_id is not None:
+            try:
+                return await self.bot.send_photo(chat_id, photo=file_id, **kwargs)
+            except Exception as e:
+                # asyncio_helper объявляет свой ApiTelegramException, поэтому смотрим на код ошибки
+                if getattr(e, "error_code", None) != 400:
+                    raise
+                log.info("stale_file_id", path=path)
+                await asyncio.to_thread(self._forget, digest)
+        with open(path, "rb") as photo:
+            message = await self.bot.send_photo(chat_id, photo=photo, **kwargs)
+        await asyncio.to_thread(self._remember, digest, message)
+        return message
+
+    async def warm_up(self, paths, chat_id):
+        for path in paths:
+            try:
+                _, file_id = await asyncio.to_thread(self._resolve, path)
+                if file_id is None:
+                    await self.send_photo(chat_id, path, disable_notification=True)
+            except FileNotFoundError:
+                log.error("requisites_image_missing", path=path)
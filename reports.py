@@ -0,0 +1,113 @@
+# Отчёты для операторов: суммы по банкам за день, сводка по пользователям и
+# выгрузка транзакций за период. Данные читаются пачками и сразу пишутся в файл,
+# поэтому память не зависит от размера таблицы.
+# CSV пишется всегда; Parquet — если установлен pyarrow (pip install pyarrow).
+# Запуск:
+#   python reports.py daily --since 2026-01-01 --until 2026-01-31 --out daily.csv
+#   python reports.py users --format parquet --out users.parquet
+#   python reports.py transactions --since 2026-01-01 --until 2026-02-01 --out jan.parquet
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime, timedelta
+
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+# Колонки отчётов и их типы в Parquet
+REPORTS = {
+    "daily": [("day", "string"), ("bank", "string"), ("count", "int64"), ("amount", "float64")],
+    "users": [("user_id", "int64"), ("count", "int64"), ("amount", "float64"), ("first_ts", "int64"), ("last_ts", "int64")],
+    "transactions": [("id", "int64"), ("user_id", "int64"), ("bank", "string"), ("amount", "float64"), ("ts", "int64")],
+}
+
+
+def day_to_ts(day):
+    # Начало дня 'YYYY-MM-DD' по локальному времени — в нём же хранится date
+    return int(time.mktime(datetime.strptime(day, "%Y-%m-%d").timetuple()))
+
+
+def report_chunks(db, report, since=None, until=None, chunk_size=10_000):
+    # since/until — дни 'YYYY-MM-DD' включительно
+    if report == "daily":
+        return db.stream_daily_totals(since, until, chunk_size=chunk_size)
+    if report == "users":
+        return db.stream_user_totals(chunk_size=chunk_size)
+    if report == "transactions":
+        until_ts = None
+        if until is not None:
+            until_ts = day_to_ts((datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"))
+        return db.stream_transactions(day_to_ts(since) if since else None, until_ts, chunk_size=chunk_size)
+    raise ValueError(f"Неизвестный отчёт: {report}")
+
+
+def write_csv(out, columns, chunks):
+    writer = csv.writer(out)
+    writer.writerow([name for name, _ in columns])
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(path, columns, chunks):
+    # Каждая пачка — отдельная row group, файл пишется потоково
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для формата parquet нужен pyarrow: pip install pyarrow") from None
+    schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def export(db, report, out, fmt="csv", since=None, until=None, chunk_size=10_000):
+    # out — путь или "-" (stdout, только csv). Возвращает число выгруженных строк
+    columns = REPORTS[report]
+    chunks = report_chunks(db, report, since, until, chunk_size)
+    started = time.monotonic()
+    if fmt == "parquet":
+        rows = write_parquet(out, columns, chunks)
+    elif out == "-":
+        rows = write_csv(sys.stdout, columns, chunks)
+    else:
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            rows = write_csv(f, columns, chunks)
+    log.info("report_exported", report=report, format=fmt, rows=rows, elapsed=round(time.monotonic() - started, 2))
+    return rows
+
+
+def main():
+    from database import Database
+    from instrumentation import setup_logging
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--since", help="первый день, YYYY-MM-DD")
+    parser.add_argument("--until", help="последний день, YYYY-MM-DD")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default="-", help="файл отчёта; '-' — stdout (csv)")
+    parser.add_argument("--db", default="users.db")
+    args = parser.parse_args()
+    if args.format == "parquet" and args.out == "-":
+        parser.error("для parquet нужен --out")
+
+    setup_logging()
+    db = Database(args.db)
+    try:
+        export(db, args.report, args.out, args.format, args.since, args.until)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
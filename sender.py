@@ -0,0 +1,407 @@
+# Планировщик исходящих сообщений: общий и per-chat лимиты (token bucket),
+# автоматический повтор после 429 с retry_after, приоритеты (ответы пользователям
+# раньше рассылок) и склейка подряд идущих текстов в один чат.
+# Порядок сообщений внутри одного чата сохраняется. SendScheduler — для TeleBot
+# (рабочие потоки), AsyncSendScheduler — для AsyncTeleBot (задачи asyncio).
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from telebot.apihelper import ApiTelegramException
+
+from instrumentation import get_logger, metrics
+
+log = get_logger(__name__)
+
+INTERACTIVE = 0
+BROADCAST = 10
+
+MAX_MESSAGE_LENGTH = 4096
+# Параметры send_message, при которых сообщения ещё можно склеить
+_MERGEABLE_KWARGS = {"parse_mode", "reply_markup"}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # Забирает токен и возвращает, сколько секунд подождать, пока он «созреет»
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        # Ни одного токена раньше, чем через seconds (retry_after от Telegram)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def delay(self):
+        # Через сколько секунд появится токен, без списания
+        with self._lock:
+            tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+            return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def full(self):
+        with self._lock:
+            return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+class _Job:
+    # args/kwargs — аргументы вызова метода бота как есть; chat_id — ключ очереди
+    __slots__ = ("method", "chat_id", "args", "kwargs", "priority", "futures", "attempts")
+
+    def __init__(self, method, chat_id, args, kwargs, priority, future):
+        self.method = method
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.futures = [future]
+        self.attempts = 0
+
+    def text(self):
+        return self.args[1]
+
+    def mergeable(self):
+        return (
+            self.method == "send_message"
+            and isinstance(self.text(), str)
+            and set(self.kwargs) <= _MERGEABLE_KWARGS
+        )
+
+    def merge(self, other):
+        # Склеиваем, если у первого сообщения нет клавиатуры и совпадает parse_mode
+        if not (self.mergeable() and other.mergeable()):
+            return False
+        if self.kwargs.get("reply_markup") is not None:
+            return False
+        if self.kwargs.get("parse_mode") != other.kwargs.get("parse_mode"):
+            return False
+        text = self.text() + "\n\n" + other.text()
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+        self.args = (self.chat_id, text)
+        self.kwargs = dict(other.kwargs)
+        self.priority = min(self.priority, other.priority)
+        self.futures.extend(other.futures)
+        return True
+
+
+class _SchedulerQueues:
+    # Очереди и лимиты, общие для SendScheduler (потоки) и AsyncSendScheduler
+    # (asyncio). Методы не берут блокировок — их вызывает подкласс под своей
+    def __init__(self, bot, global_rate=30.0, chat_rate=1.0, chat_burst=4, workers=4, max_retries=5, merge=True):
+        # Оригинальные методы бота; install() подменяет их на постановку в очередь
+        self._methods = {
+            "send_message": bot.send_message,
+            "send_photo": bot.send_photo,
+            "edit_message_text": bot.edit_message_text,
+        }
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.merge = merge
+        # Общий лимит без запаса на всплеск: в любой секунде не больше global_rate запросов
+        self._global = TokenBucket(global_rate, 1)
+        self._chat_buckets = {}
+        self._bucket_limit = 10_000
+        self._chats = {}  # chat_id -> deque заданий (FIFO внутри чата)
+        self._ready = []  # (priority, seq, chat_id) — чаты, которые можно обслужить сейчас
+        self._delayed = []  # (not_before, seq, chat_id) — чаты, ждущие лимита или retry_after
+        self._seq = itertools.count()
+        self._pending = 0
+        self._closed = False
+        metrics.gauge("bot_send_queue_depth", lambda: self._pending)
+
+    @classmethod
+    def from_env(cls, bot):
+        return cls(
+            bot,
+            global_rate=float(os.getenv("SEND_GLOBAL_RATE", "30")),
+            chat_rate=float(os.getenv("SEND_CHAT_RATE", "1")),
+            chat_burst=int(os.getenv("SEND_CHAT_BURST", "4")),
+            workers=int(os.getenv("SEND_WORKERS", "4")),
+        )
+
+    def install(self, bot):
+        # Теперь bot.send_message и др. идут через очередь
+        bot.send_message = self.send_message
+        bot.send_photo = self.send_photo
+        bot.edit_message_text = self.edit_message_text
+        return self
+
+    def _enqueue(self, job):
+        if self._closed:
+            raise RuntimeError("SendScheduler остановлен")
+        self._pending += 1
+        jobs = self._chats.get(job.chat_id)
+        if jobs is None:
+            self._chats[job.chat_id] = deque([job])
+            self._schedule(job.chat_id, job.priority, self._chat_bucket(job.chat_id).delay())
+        else:
+            jobs.append(job)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Полные корзины неактивных чатов не нужны — чистим, чтобы словарь не рос
+            if len(self._chat_buckets) > self._bucket_limit:
+                for key in [key for key, value in self._chat_buckets.items() if key not in self._chats and value.full()]:
+                    del self._chat_buckets[key]
+                # При рассылке корзины не успевают наполниться — не сканируем словарь на каждом новом чате
+                self._bucket_limit = max(10_000, 2 * len(self._chat_buckets))
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _schedule(self, chat_id, priority, delay):
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+
+    def _take_job(self):
+        # Задание, которое можно отправить сейчас, или None
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (self._chats[chat_id][0].priority, next(self._seq), chat_id))
+        if not self._ready:
+            return None
+        _, _, chat_id = heapq.heappop(self._ready)
+        jobs = self._chats[chat_id]
+        job = jobs.popleft()
+        while self.merge and jobs and job.merge(jobs[0]):
+            jobs.popleft()
+            metrics.inc("bot_send_merged_total")
+        return job
+
+    def _wait_timeout(self):
+        return self._delayed[0][0] - time.monotonic() if self._delayed else None
+
+    def _prepare(self, job):
+        # Файл при повторе после 429 нужно выгрузить с начала
+        photo = job.kwargs.get("photo")
+        if hasattr(photo, "seek"):
+            photo.seek(0)
+        return self._methods[job.method]
+
+    def _retry_after(self, job, error):
+        # Секунды до повтора после 429 или None, если задание завершилось ошибкой.
+        # У asyncio_helper свой ApiTelegramException, поэтому смотрим только на атрибуты
+        job.attempts += 1
+        if getattr(error, "error_code", None) != 429 or job.attempts > self.max_retries:
+            return None
+        retry_after = (error.result_json or {}).get("parameters", {}).get("retry_after", 1)
+        # Flood-лимит Telegram действует на весь бот, а не только на этот чат:
+        # придерживаем и общий лимит, иначе другие чаты получат серию 429
+        self._global.pause(retry_after)
+        metrics.inc("bot_send_retried_total")
+        log.warning("flood_limited", chat_id=job.chat_id, retry_after=retry_after)
+        return retry_after
+
+    def _requeue(self, job, retry_after):
+        jobs = self._chats[job.chat_id]
+        if retry_after is not None:
+            jobs.appendleft(job)
+            self._schedule(job.chat_id, job.priority, retry_after)
+        elif jobs:
+            self._schedule(job.chat_id, jobs[0].priority, self._chat_bucket(job.chat_id).delay())
+        else:
+            del self._chats[job.chat_id]
+
+    def _settle(self, job, result=None, error=None):
+        if error is not None:
+            metrics.inc("bot_send_failed_total", method=job.method)
+            log.warning("send_failed", chat_id=job.chat_id, method=job.method, error=str(error))
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            metrics.inc("bot_send_total", method=job.method)
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(result)
+
+
+class SendScheduler(_SchedulerQueues):
+    # Рабочие потоки; методы бота после install() сразу возвращают Future
+    def __init__(self, bot, *args, **kwargs):
+        super().__init__(bot, *args, **kwargs)
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"sender-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, method, chat_id, args, kwargs, priority=INTERACTIVE):
+        job = _Job(method, chat_id, args, kwargs, priority, Future())
+        with self._cond:
+            self._enqueue(job)
+            self._cond.notify()
+        return job.futures[0]
+
+    def send_message(self, chat_id, text, priority=INTERACTIVE, **kwargs):
+        return self.submit("send_message", chat_id, (chat_id, text), kwargs, priority)
+
+    def send_photo(self, chat_id, photo, priority=INTERACTIVE, **kwargs):
+        return self.submit("send_photo", chat_id, (chat_id,), dict(kwargs, photo=photo), priority)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, priority=INTERACTIVE, **kwargs):
+        kwargs.update(text=text, chat_id=chat_id, message_id=message_id)
+        return self.submit("edit_message_text", chat_id, (), kwargs, priority)
+
+    def _next_job(self):
+        # Вызывается под self._cond; возвращает задание или None, если пора выходить
+        while True:
+            job = self._take_job()
+            if job is not None:
+                return job
+            if self._closed and not self._pending:
+                return None
+            self._cond.wait(self._wait_timeout())
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+            if job is None:
+                return
+            time.sleep(self._global.reserve())
+            with self._cond:
+                bucket = self._chat_bucket(job.chat_id)
+            bucket.reserve()
+            retry_after = None
+            try:
+                result = self._prepare(job)(*job.args, **job.kwargs)
+            except ApiTelegramException as e:
+                retry_after = self._retry_after(job, e)
+                if retry_after is None:
+                    self._finish(job, error=e)
+            except Exception as e:
+                self._finish(job, error=e)
+            else:
+                self._finish(job, result=result)
+
+            with self._cond:
+                self._requeue(job, retry_after)
+                self._cond.notify_all()
+
+    def _finish(self, job, result=None, error=None):
+        with self._cond:
+            self._pending -= len(job.futures)
+        self._settle(job, result, error)
+
+    def join(self, timeout=None):
+        # Ждёт, пока очередь опустеет
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        # Досылает всё из очереди и останавливает рабочие потоки
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class AsyncSendScheduler(_SchedulerQueues):
+    # То же для AsyncTeleBot: рабочие задачи в цикле событий. Методы бота после
+    # install() ставят сообщение в очередь и ждут отправки — await bot.send_message()
+    # возвращает Message, как и без планировщика. Рабочие задачи стартуют при
+    # первой отправке, чтобы планировщик можно было создать вне цикла событий
+    def __init__(self, bot, *args, **kwargs):
+        super().__init__(bot, *args, **kwargs)
+        self._cond = asyncio.Condition()
+        self._tasks = []
+
+    async def submit(self, method, chat_id, args, kwargs, priority=INTERACTIVE):
+        loop = asyncio.get_running_loop()
+        if not self._tasks:
+            self._tasks = [loop.create_task(self._worker(), name=f"sender-{i}") for i in range(self.workers)]
+        job = _Job(method, chat_id, args, kwargs, priority, loop.create_future())
+        async with self._cond:
+            self._enqueue(job)
+            self._cond.notify()
+        return await job.futures[0]
+
+    async def send_message(self, chat_id, text, priority=INTERACTIVE, **kwargs):
+        return await self.submit("send_message", chat_id, (chat_id, text), kwargs, priority)
+
+    async def send_photo(self, chat_id, photo, priority=INTERACTIVE, **kwargs):
+        return await self.submit("send_photo", chat_id, (chat_id,), dict(kwargs, photo=photo), priority)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, priority=INTERACTIVE, **kwargs):
+        kwargs.update(text=text, chat_id=chat_id, message_id=message_id)
+        return await self.submit("edit_message_text", chat_id, (), kwargs, priority)
+
+    async def _next_job(self):
+        async with self._cond:
+            while True:
+                job = self._take_job()
+                if job is not None:
+                    return job
+                if self._closed and not self._pending:
+                    return None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), self._wait_timeout())
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            if job is None:
+                return
+            await asyncio.sleep(self._global.reserve())
+            self._chat_bucket(job.chat_id).reserve()
+            retry_after = None
+            try:
+                result = await self._prepare(job)(*job.args, **job.kwargs)
+            except Exception as e:
+                retry_after = self._retry_after(job, e)
+                if retry_after is None:
+                    self._pending -= len(job.futures)
+                    self._settle(job, error=e)
+            else:
+                self._pending -= len(job.futures)
+                self._settle(job, result=result)
+            async with self._cond:
+                self._requeue(job, retry_after)
+                self._cond.notify_all()
+
+    async def close(self):
+        # Досылает всё из очереди и останавливает рабочие задачи
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        await asyncio.gather(*self._tasks)
+
+
+def result_of(value):
+    # Методы бота после install() возвращают Future; без планировщика — сам результат
+    return value.result() if isinstance(value, Future) else value
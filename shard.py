@@ -0,0 +1,260 @@
+# Многопроцессный режим: процесс-диспетчер получает апдейты (long polling или
+# вебхук) и раскладывает их по N рабочим процессам по user_id. Все апдейты
+# пользователя попадают в один процесс, поэтому порядок и состояние диалога
+# остаются локальными для него, а GIL больше не ограничивает обработку одним ядром.
+#
+# Хранилище — общий users.db в режиме WAL: читатели разных процессов не мешают
+# друг другу, запись сериализует SQLite (busy_timeout). Строки пользователя
+# меняет только его процесс, так что кэш профилей в каждом процессе не устаревает.
+#
+# Запуск: python shard.py (SHARD_WORKERS, SHARD_SOURCE=polling|webhook)
+# SIGHUP — поочерёдный перезапуск рабочих процессов без потери апдейтов,
+# SIGTERM/SIGINT — остановка после обработки принятых апдейтов.
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+def _worker_main(index, updates, env):
+    # Точка входа рабочего процесса (spawn: модуль бота импортируется заново)
+    os.environ.update(env)
+    # Останавливает воркеры диспетчер через очередь, а не сигналы терминала
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    from telebot import apihelper
+
+    if os.getenv("BOT_API_URL"):
+        apihelper.API_URL = os.environ["BOT_API_URL"]
+
+    import main
+    import webhook
+    from instrumentation import setup_logging, setup_metrics_export
+
+    setup_logging()
+    setup_metrics_export()
+    dispatcher = webhook.UpdateDispatcher(
+        webhook.telebot_processor(main.create_app()),
+        workers=int(os.getenv("SHARD_THREADS", "4")),
+        queue_size=int(os.getenv("SHARD_THREAD_QUEUE_SIZE", "256")),
+    ).start()
+    parent = os.getppid()
+    log.info("shard_worker_started", shard=index, pid=os.getpid())
+    try:
+        while True:
+            try:
+                update = updates.get(timeout=1.0)
+            except queue.Empty:
+                # Диспетчер умер — выходим, а не висим сиротой
+                if os.getppid() != parent:
+                    log.warning("shard_dispatcher_gone", shard=index)
+                    break
+                continue
+            if update is None:
+                break
+            dispatcher.submit(update, block=True)
+    finally:
+        dispatcher.stop()
+        main.close_app()
+        log.info("shard_worker_stopped", shard=index)
+
+
+class ShardRouter:
+    # Интерфейс как у webhook.UpdateDispatcher (submit/stats/stop/overflow),
+    # поэтому подставляется в webhook.make_server без изменений
+    overflow = "reject"
+
+    def __init__(self, workers=None, queue_size=1024, env=None, restart_delay=1.0, stop_timeout=30.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues = [self._ctx.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)]
+        self._processes = [None] * self.workers
+        self._env = [self._worker_env(index, env or {}) for index in range(self.workers)]
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._rolling = threading.Event()
+        self._supervisor = None
+        self.accepted = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _worker_env(self, index, extra):
+        env = {"SHARD_INDEX": str(index)}
+        # Лимит Telegram общий для бота — делим его между процессами
+        env["SEND_GLOBAL_RATE"] = str(float(os.getenv("SEND_GLOBAL_RATE", "30")) / self.workers)
+        if os.getenv("METRICS_PORT"):
+            env["METRICS_PORT"] = str(int(os.environ["METRICS_PORT"]) + 1 + index)
+        env["METRICS_DUMP_PATH"] = f"{os.getenv('METRICS_DUMP_PATH', 'metrics.prom')}.{index}"
+        if index:
+            # Рассылки подхватывает только нулевой воркер, иначе каждая ушла бы N раз
+            env["BROADCAST_WATCH"] = "0"
+        env.update(extra)
+        return env
+
+    def shard_for(self, update):
+        from webhook import update_user_id
+        return update_user_id(update) % self.workers
+
+    def _spawn(self, index):
+        process = self._ctx.Process(
+            target=_worker_main, args=(index, self._queues[index], self._env[index]),
+            name=f"shard-{index}", daemon=False,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._supervisor = threading.Thread(target=self._supervise, name="shard-supervisor", daemon=True)
+        self._supervisor.start()
+        return self
+
+    def submit(self, update: dict, block=False, timeout=None) -> bool:
+        try:
+            self._queues[self.shard_for(update)].put(update, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def _join_or_kill(self, index, timeout):
+        # Воркер игнорирует SIGTERM, поэтому зависший процесс добиваем SIGKILL
+        process = self._processes[index]
+        process.join(timeout)
+        if process.is_alive():
+            log.warning("shard_worker_killed", shard=index)
+            process.kill()
+            process.join()
+
+    def restart(self, index):
+        # Мягкий перезапуск: воркер дорабатывает всё, что в очереди до метки,
+        # новый процесс продолжает с того же места очереди. Если старый завис и
+        # был убит, метку заберёт новый — его поднимет супервизор
+        with self._restart_lock:
+            self._queues[index].put(None)
+            self._join_or_kill(index, self.stop_timeout)
+            self._spawn(index)
+        with self._lock:
+            self.restarts += 1
+        log.info("shard_worker_restarted", shard=index)
+
+    def rolling_restart(self):
+        # Можно вызывать из обработчика сигнала: перезапуск выполнит супервизор
+        self._rolling.set()
+
+    def _supervise(self):
+        while not self._stopping.wait(self.restart_delay):
+            if self._rolling.is_set():
+                self._rolling.clear()
+                for index in range(self.workers):
+                    if self._stopping.is_set():
+                        return
+                    self.restart(index)
+            with self._restart_lock:
+                for index, process in enumerate(self._processes):
+                    if not process.is_alive() and not self._stopping.is_set():
+                        # Упал — апдейт, который он обрабатывал, потерян, остальные ждут в очереди
+                        log.error("shard_worker_died", shard=index, exitcode=process.exitcode)
+                        self._spawn(index)
+                        with self._lock:
+                            self.restarts += 1
+
+    def stop(self, timeout=None):
+        # Дожидаемся обработки уже принятых апдейтов
+        self._stopping.set()
+        if self._supervisor:
+            self._supervisor.join()
+        for q in self._queues:
+            q.put(None)
+        deadline = time.monotonic() + (self.stop_timeout if timeout is None else timeout)
+        for index in range(self.workers):
+            self._join_or_kill(index, max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "queued": sum(q.qsize() for q in self._queues),
+            }
+
+
+def poll(router, token, stop_event, timeout=10):
+    # Long polling в диспетчере: при заполненной очереди воркера ждём, а не теряем апдейты
+    from telebot import apihelper
+
+    offset = None
+    while not stop_event.is_set():
+        try:
+            updates = apihelper.get_updates(token, offset=offset, timeout=timeout, long_polling_timeout=timeout)
+        except Exception:
+            log.exception("get_updates_failed")
+            stop_event.wait(5)
+            continue
+        for update in updates:
+            router.submit(update, block=True)
+            offset = update["update_id"] + 1
+
+
+def run():
+    import telebot
+    from dotenv import load_dotenv
+
+    import webhook
+    from database import Database
+    from instrumentation import setup_logging
+
+    load_dotenv()
+    setup_logging()
+    # Миграции — один раз в диспетчере, а не наперегонки в каждом воркере
+    Database().close()
+    router = ShardRouter(
+        workers=int(os.getenv("SHARD_WORKERS", "0")) or None,
+        queue_size=int(os.getenv("SHARD_QUEUE_SIZE", "4096")),
+    ).start()
+    log.info("shards_started", workers=router.workers)
+    stop_event = threading.Event()
+    server = None
+
+    def shutdown(*_):
+        stop_event.set()
+        if server is not None:
+            # shutdown() ждёт выхода из serve_forever — вызываем не из главного потока
+            threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, lambda *_: router.rolling_restart())
+    token = os.getenv("BOT_TOKEN")
+    try:
+        if os.getenv("SHARD_SOURCE", "polling") == "webhook":
+            server = webhook.server_from_env(router)
+            webhook.register_webhook(telebot.TeleBot(token, threaded=False))
+            log.info("webhook_listening", address=server.server_address)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+        else:
+            poll(router, token, stop_event)
+    finally:
+        router.stop()
+        log.info("shards_stopped", **router.stats())
+
+
+if __name__ == "__main__":
+    run()
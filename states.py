@@ -0,0 +1,132 @@
+# Состояния диалогов (ввод имени, адреса, суммы оплаты) вместо
+# bot.register_next_step_handler: хранилище подключаемое, брошенные
+# диалоги истекают по TTL, SQLite-вариант переживает перезапуск бота.
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+class MemoryStateStorage:
+    # chat_id -> (state, data, expires_at). TTL у всех записей одинаковый, поэтому
+    # порядок OrderedDict совпадает с порядком истечения и чистка идёт с начала
+    def __init__(self, ttl=900.0):
+        self.ttl = ttl
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._states:
+            chat_id, (_, _, expires_at) = next(iter(self._states.items()))
+            if expires_at > now:
+                break
+            del self._states[chat_id]
+
+    def set(self, chat_id, state, data):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._states.pop(chat_id, None)
+            self._states[chat_id] = (state, data, now + self.ttl)
+
+    def get(self, chat_id):
+        with self._lock:
+            entry = self._states.get(chat_id)
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        return entry[:2]
+
+    def pop(self, chat_id):
+        with self._lock:
+            entry = self._states.pop(chat_id, None)
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        return entry[:2]
+
+    def purge(self):
+        with self._lock:
+            before = len(self._states)
+            self._purge(time.monotonic())
+            return before - len(self._states)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class SQLiteStateStorage:
+    # Состояния в таблице conversation_states; время — по часам системы,
+    # чтобы TTL продолжал работать после перезапуска
+    def __init__(self, db, ttl=900.0, purge_interval=60.0):
+        self.db = db
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+    def _maybe_purge(self, now):
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.db.purge_expired_states(now)
+
+    def set(self, chat_id, state, data):
+        now = time.time()
+        self._maybe_purge(now)
+        self.db.set_state(chat_id, state, json.dumps(data), now + self.ttl)
+
+    def get(self, chat_id):
+        row = self.db.get_state(chat_id, time.time())
+        return (row[0], json.loads(row[1])) if row else None
+
+    def pop(self, chat_id):
+        row = self.db.pop_state(chat_id, time.time())
+        return (row[0], json.loads(row[1])) if row else None
+
+    def purge(self):
+        return self.db.purge_expired_states(time.time())
+
+
+def create_storage(db):
+    # STATE_STORAGE=memory|sqlite, STATE_TTL — время жизни незавершённого диалога в секундах
+    ttl = float(os.getenv("STATE_TTL", "900"))
+    if os.getenv("STATE_STORAGE", "sqlite") == "memory":
+        return MemoryStateStorage(ttl=ttl)
+    return SQLiteStateStorage(db, ttl=ttl)
+
+
+class ConversationStates:
+    # Обработчик ищется по имени состояния в словаре — O(1) на сообщение
+    def __init__(self, storage):
+        self.storage = storage
+        self.handlers = {}
+
+    def handler(self, state):
+        def decorator(func):
+            self.handlers[state] = func
+            return func
+        return decorator
+
+    def set(self, chat_id, state, **data):
+        self.storage.set(chat_id, state, data)
+
+    def has_state(self, chat_id):
+        return self.storage.get(chat_id) is not None
+
+    def pop(self, chat_id):
+        return self.storage.pop(chat_id)
+
+    def dispatch(self, message):
+        # Состояние одноразовое, как и next-step обработчик: снимаем его до вызова
+        entry = self.pop(message.chat.id)
+        if entry is None:
+            return False
+        state, data = entry
+        handler = self.handlers.get(state)
+        if handler is None:
+            log.error("unknown_conversation_state", state=state)
+            return False
+        handler(message, **data)
+        return True
@@ -0,0 +1,220 @@
+# Тексты ответов и данные, общие для синхронного и асинхронного ботов.
+# Обработчики обоих ботов получают отсюда список Reply и только отправляют их:
+# вся логика веток живёт здесь, в main.py и bot_async.py — запросы к базе и отправка
+from collections import namedtuple
+
+NOT_REGISTERED = "⚠️ Сначала зарегистрируйтесь."
+MENU_HINT = "⚠️ Пожалуйста, выберите действие из меню."
+START_FAILED = "⚠️ Произошла ошибка. Попробуйте позже."
+CALLBACK_FAILED = "⚠️ Произошла ошибка."
+NOT_IMPLEMENTED = "⚠️ Эта функция в разработке"
+AMOUNT_NOT_POSITIVE = "⚠️ Сумма должна быть положительной. Попробуйте снова."
+AMOUNT_INVALID = "⚠️ Введите корректную сумму (например, 100.50)."
+PAYMENT_FAILED = "⚠️ Произошла ошибка при обработке оплаты."
+
+# Ввод полей профиля: ключ локали при успехе и текст ошибки
+PROFILE_INPUTS = {
+    "name": ("name_updated", "⚠️ Произошла ошибка при обновлении имени. Проверьте интернет или повторите попытку."),
+    "address": ("address_updated", "⚠️ Произошла ошибка при обновлении адреса. Проверьте интернет или повторите попытку."),
+}
+
+
+class Reply(namedtuple("Reply", "text markup parse_mode action state photo fallback",
+                       defaults=(None, None, "send", None, None, None))):
+    # action: send — новое сообщение, edit — правка сообщения с кнопкой,
+    # answer — ответ на callback, photo — фото photo с подписью text (fallback — если файла нет).
+    # state — (состояние, data) диалога, который начинается после отправки
+    __slots__ = ()
+
+    def send_kwargs(self):
+        kwargs = {}
+        if self.parse_mode:
+            kwargs["parse_mode"] = self.parse_mode
+        if self.markup is not None:
+            kwargs["reply_markup"] = self.markup
+        return kwargs
+
+
+def user_locale(user, locales):
+    # (язык, локаль) профиля; у незарегистрированного — язык по умолчанию
+    lang = user["lang"] if user else "ru"
+    return lang, locales.get(lang)
+
+def get_profile_info(user_data: dict, loc: dict) -> str:
+    name = user_data.get("name", loc.get("no_name", "Имя не указано"))
+    address = user_data.get("address", loc.get("no_address", "Адрес не указан"))
+    lang = "Русский 🇷🇺" if user_data["lang"] == "ru" else "Кыргызский 🇰🇬"
+    return (
+        f"**{loc.get('profile_info', 'Ваш профиль')}:**\n\n"
+        f"📛 {loc.get('your_name', 'Ваше имя')}: `{name}`\n"
+        f"🏠 {loc.get('your_address', 'Ваш адрес')}: `{address}`\n"
+        f"🌐 {loc.get('your_language', 'Ваш язык')}: `{lang}`"
+    )
+
+# Реквизиты для банков (локальные пути к файлам)
+BANK_REQUISITES = {
+    "pay_aiyl": {
+        "name": "Aiyl Bank",
+        "image_path": "requisites/aiyl_bank.jpg"
+    },
+    "pay_rsk": {
+        "name": "RSK Bank",
+        "image_path": "requisites/rsk_bank.jpg"
+    },
+    "pay_bakai": {
+        "name": "Bakai Bank",
+        "image_path": "requisites/bakai_bank.jpg"
+    },
+    "pay_mbank": {
+        "name": "MBank",
+        "image_path": "requisites/mbank.jpg"
+    },
+    "pay_obank": {
+        "name": "O!Bank (O деньги)",
+        "image_path": "requisites/obank.jpg"
+    },
+    "pay_odeneg": {
+        "name": "Optima Bank",
+        "image_path": "requisites/optimabank.jpg"
+    },
+    "pay_sber": {
+        "name": "Сбербанк (Mir)",
+        "image_path": "requisites/sberbank.jpg"
+    },
+    "pay_tinkoff": {
+        "name": "Тинькофф (Mir)",
+        "image_path": "requisites/tinkoff.jpg"
+    },
+  
+}
+
+PAY_CALLBACKS = ["pay_aiyl", "pay_rsk", "pay_bakai", "pay_mbank", "pay_obank", "pay_odeneg", "pay_sber", "pay_tinkoff", "pay_vtb"]
+
+HISTORY_PAGE_SIZE = 10
+
+def format_history(transactions, loc) -> str:
+    history_text = f"**{loc.get('transaction_history', 'Ваша история транзакций')}:**\n\n"
+    for trans in transactions:
+        bank, amount, date = trans[:3]
+        history_text += f"- {loc.get('bank', 'Банк')}: {bank}, {loc.get('amount', 'Сумма')}: {amount} KGS, {loc.get('date', 'Дата')}: {date}\n"
+    return history_text
+
+def payment_instruction(data: str, bank_name: str, amount: float) -> str:
+    if "Mir" in bank_name or data == "pay_mbank":
+        warning = ("⚠️ Оплата через {bank} возможна, но из-за санкций некоторые банки в Кыргызстане могут ограничивать поддержку Mir и переводы через российские банки (Сбербанк, Тинькофф, ВТБ). "
+                  "Используйте приложение банка для оплаты.")
+        return warning.format(bank=bank_name)
+    return f"Оплата через {bank_name} на сумму {amount} KGS. Откройте приложение {bank_name} или посетите ближайшее отделение для завершения транзакции."
+
+def parse_history_callback(data: str):
+    # my_history — первая страница, history_before_<id> — старее, history_after_<id> — новее
+    if data.startswith("history_before_"):
+        return int(data[len("history_before_"):]), None
+    if data.startswith("history_after_"):
+        return None, int(data[len("history_after_"):])
+    return None, None
+
+def paginate_history(rows, limit, before=None, after=None):
+    # rows запрошены с limit + 1, лишняя строка показывает, есть ли что-то дальше.
+    # Возвращает (строки страницы, id для кнопки «новее», id для кнопки «старее»)
+    has_more = len(rows) > limit
+    if after is None:
+        rows = rows[:limit]
+    else:
+        rows = rows[len(rows) - limit:] if has_more else rows
+    if not rows:
+        return rows, None, None
+    if after is None:
+        newer = rows[0][3] if before is not None else None
+        older = rows[-1][3] if has_more else None
+    else:
+        newer = rows[0][3] if has_more else None
+        older = rows[-1][3]
+    return rows, newer, older
+
+def is_history_callback(data: str) -> bool:
+    return data == "my_history" or data.startswith("history_")
+
+def start_replies(user, locales, keyboards):
+    lang, loc = user_locale(user, locales)
+    text = loc.get("welcome", "Добро пожаловать!") + "\n\n" + loc.get("help", "Используйте кнопки ниже:")
+    return [Reply(text, keyboards.get("main", lang))]
+
+def callback_replies(data, user, locales, keyboards):
+    # Ветки, которым хватает профиля из кэша; register, lang_* и история
+    # зарегистрированного пользователя сначала идут в базу (см. ниже)
+    lang, loc = user_locale(user, locales)
+    if not user and (data in ("show_address", "my_profile") or is_history_callback(data)):
+        return [Reply(NOT_REGISTERED)]
+    if data == "edit_profile":
+        return [Reply(loc["edit_profile"], keyboards.get("edit_profile", lang))]
+    if data == "set_name":
+        return [Reply(loc["enter_name"], state=("name", {}))]
+    if data == "set_address":
+        return [Reply(loc["enter_address"], state=("address", {}))]
+    if data == "change_lang":
+        return [Reply(loc.get("select_lang", "Выберите язык:"), keyboards.get("lang", lang))]
+    if data == "show_address":
+        address = user.get("address", loc.get("no_address", "Адрес не указан"))
+        return [Reply(f"**{loc.get('your_address', 'Ваш адрес')}:**\n\n`{address}`", parse_mode="Markdown")]
+    if data == "my_profile":
+        return [Reply(get_profile_info(user, loc), keyboards.get("profile", lang), parse_mode="Markdown")]
+    if data == "back_to_main":
+        return [Reply(loc.get("help", "Используйте кнопки ниже:"), keyboards.get("main", lang))]
+    if data == "instruction":
+        return [Reply(loc.get("instruction_text", "Инструкция недоступна"))]
+    if data == "pay":
+        return [Reply(loc.get("select_payment_method", "Выберите способ оплаты:"), keyboards.get("payment", lang))]
+    if data in PAY_CALLBACKS:
+        return [Reply(loc.get("enter_amount", "Введите сумму оплаты (в KGS):"), state=("payment_amount", {"data": data}))]
+    return [Reply(NOT_IMPLEMENTED, action="answer")]
+
+def register_replies(user, profile, created, locales, keyboards):
+    # user — профиль до нажатия (None, если пользователя не было), profile — после регистрации
+    _, loc = user_locale(user, locales)
+    if created:
+        text = loc.get("registration_success", "Вы успешно зарегистрированы!")
+    else:
+        text = loc.get("already_registered", "Вы уже зарегистрированы.")
+    lang, loc = user_locale(profile, locales)
+    return [Reply(text), Reply(loc.get("help", "Используйте кнопки ниже:"), keyboards.get("main", lang))]
+
+def lang_changed_replies(profile, locales, keyboards):
+    lang, loc = user_locale(profile, locales)
+    return [Reply(loc["lang_changed"], keyboards.get("main", lang), action="edit")]
+
+def history_query(data):
+    # (before, after, limit) для db.get_transactions
+    before, after = parse_history_callback(data)
+    return before, after, HISTORY_PAGE_SIZE + 1
+
+def history_replies(data, rows, user, locales):
+    # my_history — новое сообщение, листание — правка того же сообщения
+    from keyboards import get_history_kb
+
+    before, after = parse_history_callback(data)
+    transactions, newer, older = paginate_history(rows, HISTORY_PAGE_SIZE, before, after)
+    _, loc = user_locale(user, locales)
+    if data == "my_history" and not transactions:
+        return [Reply(loc.get("no_transactions", "У вас нет транзакций."))]
+    return [Reply(
+        format_history(transactions, loc), get_history_kb(loc, newer, older), parse_mode="Markdown",
+        action="send" if data == "my_history" else "edit",
+    )]
+
+def payment_replies(data, amount, user, keyboards):
+    bank_name = BANK_REQUISITES[data]["name"]
+    lang = user["lang"] if user else "ru"
+    return [
+        Reply(payment_instruction(data, bank_name, amount)),
+        Reply(
+            f"Реквизиты для оплаты через {bank_name} на сумму {amount} KGS", action="photo",
+            photo=BANK_REQUISITES[data]["image_path"],
+            fallback=f"⚠️ Изображение с реквизитами для {bank_name} не найдено. Пожалуйста, обратитесь в поддержку.",
+        ),
+        Reply("Назад в главное меню", keyboards.get("main", lang)),
+    ]
+
+def profile_updated_replies(field, profile, locales):
+    _, loc = user_locale(profile, locales)
+    return [Reply(loc[PROFILE_INPUTS[field][0]])]
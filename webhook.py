@@ -0,0 +1,221 @@
+# Режим вебхука: HTTP-сервер принимает апдейты от Telegram и раскладывает их
+# по ограниченным очередям рабочих потоков. Апдейты одного чата всегда попадают
+# в одну очередь, поэтому обрабатываются строго по порядку.
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+from instrumentation import get_logger, metrics
+
+log = get_logger(__name__)
+
+
+def update_chat_id(update: dict):
+    # chat_id, по которому апдейт привязывается к рабочему потоку
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in update:
+            return update[key]["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        return message["chat"]["id"] if message else callback["from"]["id"]
+    for value in update.values():
+        if isinstance(value, dict) and "from" in value:
+            return value["from"]["id"]
+    return 0
+
+
+def update_user_id(update: dict):
+    # user_id автора апдейта; для апдейтов без автора — chat_id
+    for value in update.values():
+        if isinstance(value, dict) and "from" in value:
+            return value["from"]["id"]
+    return update_chat_id(update)
+
+
+class UpdateDispatcher:
+    # overflow="reject": при переполнении очереди вебхук отвечает 503 и Telegram
+    # повторит доставку позже; overflow="drop": апдейт отбрасывается с ответом 200
+    def __init__(self, process, workers=8, queue_size=1024, overflow="reject"):
+        self.process = process
+        self.overflow = overflow
+        per_worker = max(1, queue_size // workers)
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=10_000)
+
+    def start(self):
+        for index, q in enumerate(self._queues):
+            thread = threading.Thread(target=self._worker, args=(q,), name=f"webhook-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, update: dict, block=False) -> bool:
+        # block=True — ждать места в очереди вместо отказа
+        q = self._queues[hash(update_chat_id(update)) % len(self._queues)]
+        try:
+            q.put((time.monotonic(), update), block=block)
+        except queue.Full:
+            with self._lock:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                else:
+                    self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def _worker(self, q):
+        while True:
+            item = q.get()
+            if item is None:
+                q.task_done()
+                return
+            received_at, update = item
+            try:
+                self.process(update)
+                ok = True
+            except Exception:
+                ok = False
+                log.exception("webhook_update_failed")
+            with self._lock:
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+                self.latencies.append(time.monotonic() - received_at)
+            q.task_done()
+
+    def join(self):
+        for q in self._queues:
+            q.join()
+
+    def stop(self):
+        # Дожидаемся обработки уже принятых апдейтов
+        for q in self._queues:
+            q.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "failed": self.failed,
+                "queued": sum(q.qsize() for q in self._queues),
+            }
+
+
+def make_server(dispatcher, host="0.0.0.0", port=8443, path="/webhook", secret=None, record_path=None):
+    record_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self, status, body=b"", content_type="text/plain"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if self.path != path:
+                return self._reply(404)
+            if secret and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+                return self._reply(403)
+            try:
+                update = json.loads(body)
+            except ValueError:
+                return self._reply(400)
+            if record_path:
+                with record_lock, open(record_path, "ab") as f:
+                    f.write(body.rstrip() + b"\n")
+            if dispatcher.submit(update) or dispatcher.overflow == "drop":
+                return self._reply(200)
+            return self._reply(503)
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                return self._reply(404)
+            lines = [f"bot_webhook_updates_{name} {value}" for name, value in dispatcher.stats().items()]
+            body = "\n".join(lines) + "\n" + metrics.render()
+            return self._reply(200, body.encode(), content_type="text/plain; version=0.0.4")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def telebot_processor(bot):
+    # Апдейт обрабатывается прямо в рабочем потоке диспетчера, без пула TeleBot,
+    # иначе порядок апдейтов внутри чата снова потеряется
+    bot.threaded = False
+
+    def process(update):
+        bot.process_new_updates([types.Update.de_json(update)])
+
+    return process
+
+
+def server_from_env(dispatcher):
+    # Настройки берутся из окружения (см. .env)
+    return make_server(
+        dispatcher,
+        host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEBHOOK_PORT", "8443")),
+        path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        secret=os.getenv("WEBHOOK_SECRET"),
+        record_path=os.getenv("WEBHOOK_RECORD_PATH"),
+    )
+
+
+def register_webhook(bot):
+    # Регистрирует вебхук в Telegram, если задан WEBHOOK_URL
+    public_url = os.getenv("WEBHOOK_URL")
+    if public_url:
+        bot.remove_webhook()
+        bot.set_webhook(
+            url=public_url.rstrip("/") + os.getenv("WEBHOOK_PATH", "/webhook"),
+            secret_token=os.getenv("WEBHOOK_SECRET"),
+        )
+
+
+def run(bot):
+    dispatcher = UpdateDispatcher(
+        telebot_processor(bot),
+        workers=int(os.getenv("WEBHOOK_WORKERS", "8")),
+        queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", "1024")),
+        overflow=os.getenv("WEBHOOK_OVERFLOW", "reject"),
+    ).start()
+    server = server_from_env(dispatcher)
+    register_webhook(bot)
+    log.info("webhook_listening", address=server.server_address)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        dispatcher.stop()